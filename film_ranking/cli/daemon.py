@@ -0,0 +1,131 @@
+"""
+Long running process answering CLI commands over a Unix socket, so its connections,
+page caches and in-memory columns stay warm between commands. A request is one JSON
+line {"cwd": ..., "args": {parsed arguments}}, answered by one JSON line
+{"handled": ..., "status": ..., "stdout": ..., "stderr": ...}.
+"""
+
+import argparse
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+SOCKET_PATH = "./processed_data/film_ranking.sock"
+# commands a daemon can answer
+FORWARDED = ("search", "analyze", "compare", "complete")
+
+
+def socket_path():
+    return os.environ.get("FILM_RANKING_SOCKET", SOCKET_PATH)
+
+
+def execute(request):
+    """
+    Answer `request`, unhandled when it holds no command (e.g. a liveness check) or
+    was sent from another working directory, whose database may differ.
+    """
+    if not request.get("args") or request.get("cwd") != os.getcwd():
+        return dict(handled=False)
+    from ..lib.analyze import ranking_settings
+    from .output import run_command
+
+    args = argparse.Namespace(**request["args"])
+    out, err = io.StringIO(), io.StringIO()
+    status = 0
+    try:
+        with ranking_settings(args.engine, getattr(args, "workers", None)):
+            handled = run_command(args, out, err)
+    except Exception as error:
+        handled = True
+        status = 1
+        err.write(f"Error: {error!r}\n")
+    return dict(
+        handled=handled, status=status, stdout=out.getvalue(), stderr=err.getvalue()
+    )
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        response = execute(json.loads(self.rfile.readline()))
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """
+    Handles requests on a fixed pool of threads, rather than a thread per request,
+    so the read-only connections every thread keeps are reused.
+    """
+
+    def __init__(self, path, threads=None):
+        super().__init__(path, RequestHandler)
+        self.pool = ThreadPoolExecutor(threads or os.cpu_count())
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+def serve(path=None, threads=None):
+    path = path or socket_path()
+    if os.path.exists(path):
+        # left behind by a daemon that did not stop cleanly
+        if forward_request(path, None) is not None:
+            raise RuntimeError(f"A daemon is already serving {path}")
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    server = DaemonServer(path, threads)
+    print(f"Serving on {path}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def forward_request(path, args):
+    """The response of the daemon at `path` to `args`, None when none is running."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            request = dict(cwd=os.getcwd(), args=vars(args) if args else {})
+            client.sendall(json.dumps(request).encode() + b"\n")
+            with client.makefile("rb") as f:
+                line = f.readline()
+    except OSError:
+        return None
+    return json.loads(line) if line else None
+
+
+def forward(args):
+    """
+    Have a running daemon answer the command of `args` and print its answer. False
+    when no daemon is running or it can not answer, the command then runs here.
+    """
+    path = socket_path()
+    if args.command not in FORWARDED or not os.path.exists(path):
+        return False
+    response = forward_request(path, args)
+    if not response or not response["handled"]:
+        return False
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    if response["status"]:
+        sys.exit(response["status"])
+    return True
@@ -3,14 +3,13 @@ import os
 from importlib import resources
 
 from colorama import init, Fore
-import papermill as pm
 from datetime import datetime
 import sys
-import nbformat
-from nbconvert import HTMLExporter
-import io
 
+from ..lib.batch import JOBS, print_summary, run_batch
 from ..lib.util import print_color
+from .daemon import SOCKET_PATH, forward, serve
+from .output import FORMATS, parse_after, run_command
 
 # Initialize colorama
 init(autoreset=True)
@@ -103,6 +102,8 @@ def execute_notebook_by_params(notebook, output_notebook, params: dict):
     os.makedirs(os.path.dirname(output_notebook), exist_ok=True)
 
     print_color(f"Executing notebook {notebook_path}", Fore.WHITE)
+    import papermill as pm
+
     pm.execute_notebook(
         notebook_path,
         output_notebook,
@@ -116,6 +117,8 @@ def execute_notebook_by_params(notebook, output_notebook, params: dict):
 
 
 def display_notebook_output(notebook_path):
+    import nbformat
+
     with open(notebook_path, "r", encoding="utf-8") as f:
         nb = nbformat.read(f, as_version=4)
 
@@ -131,9 +134,24 @@ def display_notebook_output(notebook_path):
             print()  # Add a blank line between cell outputs
 
 
-def load_data(folder, load_data_service):
+def serve_queries(host, port, threads):
+    # asyncio is only imported by this command
+    import asyncio
+
+    from .service import serve_http
+
+    def ready(server):
+        print_color(f"Serving on http://{host}:{port}", Fore.GREEN)
+
+    try:
+        asyncio.run(serve_http(host, port, threads, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def load_data(folder, load_data_service, **options):
     print_color(f"Loading data from folder: {folder}", Fore.CYAN)
-    load_data_service(folder)
+    load_data_service(folder, **options)
 
 
 def search_movie(kw: str, limit: int):
@@ -182,6 +200,8 @@ def analyze_top(global_args, category, sort_by=None, **kwargs):
                 start_year=global_args.start_year,
                 end_year=global_args.end_year,
                 sort_by=sort_by,
+                limit=kwargs.get("limit"),
+                after=kwargs.get("after"),
             ),
         )
     elif category == "producers":
@@ -194,6 +214,8 @@ def analyze_top(global_args, category, sort_by=None, **kwargs):
                 start_year=global_args.start_year,
                 end_year=global_args.end_year,
                 sort_by=sort_by,
+                limit=kwargs.get("limit"),
+                after=kwargs.get("after"),
             ),
         )
     elif category == "actors":
@@ -206,6 +228,8 @@ def analyze_top(global_args, category, sort_by=None, **kwargs):
                 start_year=global_args.start_year,
                 end_year=global_args.end_year,
                 sort_by=sort_by,
+                limit=kwargs.get("limit"),
+                after=kwargs.get("after"),
             ),
         )
     elif category == "movies":
@@ -312,10 +336,48 @@ def run_cli(load_data_service):
         type=int,
         help="The end year for the analysis (default: current year)",
     )
+    parser.add_argument(
+        "-engine",
+        "--engine",
+        choices=["sqlite", "numpy"],
+        help="Engine computing the rankings (default: sqlite)",
+    )
+    parser.add_argument(
+        "-format",
+        "--format",
+        choices=FORMATS,
+        default="table",
+        help="How search, analyze and compare results are printed (default: table)",
+    )
+    parser.add_argument(
+        "-report",
+        "--report",
+        action="store_true",
+        help="Run the notebook of the command and print its outputs instead",
+    )
 
     # Load data command
     load_parser = subparsers.add_parser("load_data", help="Load data from a folder")
     load_parser.add_argument("folder", help="Folder containing data files")
+    load_parser.add_argument(
+        "-batch-size", type=int, help="Rows sent to the database per batch"
+    )
+    load_parser.add_argument(
+        "-defer-indexes",
+        action="store_true",
+        help="Build secondary indexes after the data is loaded",
+    )
+    load_parser.add_argument(
+        "-workers", type=int, help="Processes used to parse each file (default: 1)"
+    )
+    load_parser.add_argument(
+        "-jobs", type=int, help="Files loaded at the same time (default: 1)"
+    )
+    load_parser.add_argument(
+        "-incremental",
+        action="store_true",
+        help="Skip unchanged files and only write rows that changed",
+    )
 
     # Load data
     search_parser = subparsers.add_parser("search", help="Tool to search")
@@ -328,6 +390,47 @@ def run_cli(load_data_service):
         esubparser.add_argument("-keyword", help="Search keyword")
         esubparser.add_argument("-limit", help="Search keyword")
 
+    # Autocomplete
+    complete_parser = subparsers.add_parser(
+        "complete", help="Complete a title or name, most voted first"
+    )
+    complete_subparsers = complete_parser.add_subparsers(
+        dest="complete_entity", help="complete entity"
+    )
+    for entity in ["movie", "person"]:
+        esubparser = complete_subparsers.add_parser(entity, help=f"Complete {entity}")
+        esubparser.add_argument("prefix", help="Beginning of the title or name")
+        esubparser.add_argument(
+            "-limit", type=int, default=10, help="Number of completions (default: 10)"
+        )
+
+    # Daemon
+    serve_parser = subparsers.add_parser(
+        "serve", help="Answer the commands of other CLI runs with a warm process"
+    )
+    serve_parser.add_argument(
+        "-socket",
+        "--socket",
+        help=f"Unix socket to listen on (default: FILM_RANKING_SOCKET or {SOCKET_PATH})",
+    )
+    serve_parser.add_argument(
+        "-threads", type=int, help="Commands answered at once (default: one per core)"
+    )
+
+    # HTTP service
+    http_parser = subparsers.add_parser(
+        "http", help="Serve search, rankings and comparisons over HTTP"
+    )
+    http_parser.add_argument(
+        "-host", "--host", default="127.0.0.1", help="Address to listen on"
+    )
+    http_parser.add_argument(
+        "-port", "--port", type=int, default=8000, help="Port to listen on"
+    )
+    http_parser.add_argument(
+        "-threads", type=int, help="Queries computed at once (default: one per core)"
+    )
+
     # Analyze command
     analyze_parser = subparsers.add_parser("analyze", help="Analyze data")
     analyze_subparsers = analyze_parser.add_subparsers(
@@ -338,6 +441,27 @@ def run_cli(load_data_service):
     for category in ["director", "actor", "producer"]:
         analyze_subparsers.add_parser(f"top_{category}", help=f"Analyze top {category}")
 
+    # Every ranking at once
+    all_parser = analyze_subparsers.add_parser(
+        "all", help="Run several rankings at the same time and save them as CSV"
+    )
+    all_parser.add_argument(
+        "-jobs", nargs="+", choices=list(JOBS), help="Rankings to run (default: all)"
+    )
+    all_parser.add_argument(
+        "-threads", type=int, help="Rankings run at the same time (default: all)"
+    )
+    all_parser.add_argument(
+        "-limit",
+        type=int,
+        help="Rows of the movies, directors, producers and actors rankings"
+        " (default: 10 movies, every person)",
+    )
+    all_parser.add_argument(
+        "-output",
+        help="Folder of the results and summary.json (default: processed_data/batch)",
+    )
+
     # Top movies
     top_movies_parser = analyze_subparsers.add_parser(
         "top_movies", help="Analyze top movies"
@@ -381,6 +505,15 @@ def run_cli(load_data_service):
         "finalAssessmentValue",
     ]
     directors_subparsers.add_argument("-sort_by", choices=director_sort_choices)
+    directors_subparsers.add_argument(
+        "-limit", type=int, help="Number of directors per page (default: all)"
+    )
+    directors_subparsers.add_argument(
+        "-after", help="Cursor printed below the previous page: <sort value>,<id>"
+    )
+    directors_subparsers.add_argument(
+        "-workers", type=int, help="Processes computing the ranking (0: one per core)"
+    )
 
     # Top producers
     producers_subparsers = analyze_subparsers.add_parser(
@@ -388,6 +521,15 @@ def run_cli(load_data_service):
     )
     producer_sort_choices = ["movieCount", "awardsCount", "avgRating", "totalProduct"]
     producers_subparsers.add_argument("-sort_by", choices=producer_sort_choices)
+    producers_subparsers.add_argument(
+        "-limit", type=int, help="Number of producers per page (default: all)"
+    )
+    producers_subparsers.add_argument(
+        "-after", help="Cursor printed below the previous page: <sort value>,<id>"
+    )
+    producers_subparsers.add_argument(
+        "-workers", type=int, help="Processes computing the ranking (0: one per core)"
+    )
 
     # Top actors
     actors_subparsers = analyze_subparsers.add_parser(
@@ -395,6 +537,15 @@ def run_cli(load_data_service):
     )
     actor_sort_choices = ["movieCount", "awardsCount", "countryCount", "avgRating"]
     actors_subparsers.add_argument("-sort_by", choices=actor_sort_choices)
+    actors_subparsers.add_argument(
+        "-limit", type=int, help="Number of actors per page (default: all)"
+    )
+    actors_subparsers.add_argument(
+        "-after", help="Cursor printed below the previous page: <sort value>,<id>"
+    )
+    actors_subparsers.add_argument(
+        "-workers", type=int, help="Processes computing the ranking (0: one per core)"
+    )
 
     # Compare command
     compare_parser = subparsers.add_parser("compare", help="Compare items")
@@ -429,16 +580,56 @@ def run_cli(load_data_service):
 
     args.end_year = current_year if args.end_year is None else args.end_year
     args.start_year = 1000 if args.start_year is None else args.start_year
+    if args.engine:
+        # inherited by the notebook kernels
+        os.environ["FILM_RANKING_ENGINE"] = args.engine
+    if args.command == "analyze" and getattr(args, "workers", None) is not None:
+        os.environ["FILM_RANKING_WORKERS"] = str(args.workers)
+    if getattr(args, "after", None):
+        args.after = parse_after(args.after)
+
+    if not args.report or args.command == "complete":
+        # answered by a running daemon, or computed here without any notebook
+        if forward(args) or run_command(args):
+            return
 
     if args.command == "load_data":
-        load_data(args.folder, load_data_service)
+        options = {}
+        if args.batch_size:
+            options["batch_size"] = args.batch_size
+        if args.defer_indexes:
+            options["defer_indexes"] = True
+        if args.workers:
+            options["workers"] = args.workers
+        if args.jobs:
+            options["jobs"] = args.jobs
+        if args.incremental:
+            options["incremental"] = True
+        load_data(args.folder, load_data_service, **options)
     elif args.command == "search":
         if args.search_entity == "movie":
             search_movie(kw=args.keyword, limit=args.limit if args.limit else 10)
         if args.search_entity == "person":
             search_person(kw=args.keyword, limit=args.limit if args.limit else 10)
+    elif args.command == "complete":
+        print_color("Error: Please specify movie or person", Fore.RED)
+    elif args.command == "serve":
+        serve(args.socket, args.threads)
+    elif args.command == "http":
+        serve_queries(args.host, args.port, args.threads)
     elif args.command == "analyze":
-        if args.analyze_type == "top_movies":
+        if args.analyze_type == "all":
+            print_summary(
+                run_batch(
+                    args.jobs,
+                    args.start_year,
+                    args.end_year,
+                    threads=args.threads,
+                    folder=args.output,
+                    limit=args.limit,
+                )
+            )
+        elif args.analyze_type == "top_movies":
             analyze_top(
                 args,
                 "movies",
@@ -451,11 +642,29 @@ def run_cli(load_data_service):
         elif args.analyze_type == "top_countries":
             analyze_top(args, args.analyze_type.split("_")[1], args.sort_by)
         elif args.analyze_type == "top_directors":
-            analyze_top(args, args.analyze_type.split("_")[1], args.sort_by)
+            analyze_top(
+                args,
+                args.analyze_type.split("_")[1],
+                args.sort_by,
+                limit=args.limit,
+                after=args.after,
+            )
         elif args.analyze_type == "top_producers":
-            analyze_top(args, args.analyze_type.split("_")[1], args.sort_by)
+            analyze_top(
+                args,
+                args.analyze_type.split("_")[1],
+                args.sort_by,
+                limit=args.limit,
+                after=args.after,
+            )
         elif args.analyze_type == "top_actors":
-            analyze_top(args, args.analyze_type.split("_")[1], args.sort_by)
+            analyze_top(
+                args,
+                args.analyze_type.split("_")[1],
+                args.sort_by,
+                limit=args.limit,
+                after=args.after,
+            )
         else:
             print_color("Error: Please specify an analysis type", Fore.RED)
     elif args.command == "compare":
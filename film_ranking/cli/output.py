@@ -0,0 +1,109 @@
+"""
+Results of the CLI commands computed in this process. The analysis modules pull in
+pandas and numpy, they are imported by the functions needing them so the CLI starts
+fast when a daemon answers or no query runs.
+"""
+
+import sys
+
+FORMATS = ["table", "csv", "json"]
+# longer results are cut in table format, csv and json always hold every row
+MAX_TABLE_ROWS = 50
+
+
+def parse_after(cursor: str):
+    """Parse a `-after` cursor "<sort value>,<id>" as printed below a ranking page."""
+    key, last_id = cursor.rsplit(",", 1)
+    return [float(key), last_id]
+
+
+def query_frame(args):
+    """
+    The DataFrame the notebook of the command displays, computed in this process.
+    None for commands without a notebook.
+    """
+    from ..lib import analyze
+
+    if args.command == "search" and args.search_entity:
+        search = (
+            analyze.search_movie
+            if args.search_entity == "movie"
+            else analyze.search_person
+        )
+        return search(args.keyword, int(args.limit or 10))
+    if args.command == "compare" and args.compare_type:
+        item1 = getattr(args, f"{args.compare_type}1")
+        item2 = getattr(args, f"{args.compare_type}2")
+        if args.compare_type == "country":
+            return analyze.countries_comparison(item1, item2, args.genre)
+        compare = getattr(analyze, f"{args.compare_type}s_comparison")
+        return compare(item1, item2)
+    if args.command != "analyze":
+        return None
+    years = (args.start_year, args.end_year)
+    if args.analyze_type == "top_movies":
+        return analyze.get_cinematic_rank(
+            *years,
+            limit=int(args.limit or 10),
+            genre=args.genre,
+            mtype=args.type,
+            country=args.country,
+            sort_by=args.sort_by,
+        )
+    if args.analyze_type == "top_countries":
+        return analyze.get_movies_with_regional_data(*years, args.sort_by)
+    rank = dict(
+        top_directors=analyze.get_directors_rank,
+        top_producers=analyze.get_producers_rank,
+        top_actors=analyze.get_actors_rank,
+    ).get(args.analyze_type)
+    if rank is None:
+        return None
+    return rank(*years, args.sort_by, args.limit, args.after)
+
+
+def print_frame(df, output_format="table", out=None, err=None):
+    """
+    Write `df` to `out` (stdout) as a table, CSV or a JSON array of records. The
+    cursor of the next page of a ranking goes below a table, to `err` (stderr)
+    otherwise.
+    """
+    out = out or sys.stdout
+    if output_format == "csv":
+        df.to_csv(out, index=False)
+    elif output_format == "json":
+        df.to_json(out, orient="records", force_ascii=False)
+        out.write("\n")
+    else:
+        out.write(df.head(MAX_TABLE_ROWS).to_string(index=False) + "\n")
+        if len(df) > MAX_TABLE_ROWS:
+            out.write(f"... {len(df) - MAX_TABLE_ROWS} more rows\n")
+    next_after = df.attrs.get("next_after")
+    if next_after:
+        key, last_id = next_after
+        notice = out if output_format == "table" else err or sys.stderr
+        notice.write(f"Next page: -after {key!r},{last_id}\n")
+
+
+def print_completions(entity, prefix, limit, out=None):
+    from ..lib.autocomplete import complete_person, complete_title
+
+    complete = complete_title if entity == "movie" else complete_person
+    out = out or sys.stdout
+    for const, label, votes in complete(prefix, limit):
+        out.write(f"{label}\t{votes}\t{const}\n")
+
+
+def run_command(args, out=None, err=None):
+    """
+    Run the command of the parsed `args` in this process, printing its result to
+    `out` and `err`. False for commands it can not run (e.g. load_data).
+    """
+    if args.command == "complete" and args.complete_entity:
+        print_completions(args.complete_entity, args.prefix, args.limit, out)
+        return True
+    df = query_frame(args)
+    if df is None:
+        return False
+    print_frame(df, args.format, out, err)
+    return True
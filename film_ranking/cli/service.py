@@ -0,0 +1,290 @@
+"""
+HTTP service answering the search, ranking and comparison queries of a dashboard as
+JSON, newline delimited JSON, CSV or Arrow. Queries run on a bounded pool of threads,
+identical queries arriving while one is computed share its result and responses are
+streamed in chunks of CHUNK_ROWS rows, so large rankings are never encoded at once.
+
+    GET /search/<movie|person>?keyword=...&limit=10
+    GET /top/<movies|countries|directors|producers|actors>?start_year=...&sort_by=...
+    GET /compare/<director|actor|producer|movie|country>?<type>1=...&<type>2=...
+
+Every path takes `format` (json, ndjson, csv or arrow) and `engine`. The cursor of
+the next page of a ranking is sent in the X-Next-After header, as the `after` of the
+request for that page.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from importlib.util import find_spec
+from urllib.parse import parse_qsl, urlsplit
+
+from .output import parse_after, query_frame
+
+HOST = "127.0.0.1"
+PORT = 8000
+CHUNK_ROWS = 1000
+CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+SEARCHES = ("movie", "person")
+RANKINGS = ("movies", "countries", "directors", "producers", "actors")
+COMPARISONS = ("director", "actor", "producer", "movie", "country")
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    406: "Not Acceptable",
+    500: "Internal Server Error",
+}
+
+
+def int_param(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+
+
+def required_param(params, name):
+    if not params.get(name):
+        raise ValueError(f"Missing parameter {name!r}")
+    return params[name]
+
+
+def query_args(path, params):
+    """
+    The parsed CLI arguments of the query at `path` with the query string `params`,
+    None for unknown paths. Raises ValueError for invalid parameters.
+    """
+    kind, _, entity = path.strip("/").partition("/")
+    args = argparse.Namespace(engine=params.get("engine"))
+    if kind == "search" and entity in SEARCHES:
+        args.command, args.search_entity = "search", entity
+        args.keyword = required_param(params, "keyword")
+        args.limit = int_param(params, "limit", 10)
+    elif kind == "top" and entity in RANKINGS:
+        args.command, args.analyze_type = "analyze", f"top_{entity}"
+        args.start_year = int_param(params, "start_year", 1000)
+        args.end_year = int_param(params, "end_year", datetime.now().year)
+        args.limit = int_param(params, "limit")
+        args.sort_by = params.get("sort_by") or None
+        after = params.get("after")
+        try:
+            args.after = parse_after(after) if after else None
+        except ValueError:
+            raise ValueError(
+                f"after must be <sort value>,<id>, got {after!r}"
+            ) from None
+        args.genre = params.get("genre")
+        args.type = params.get("type")
+        args.country = params.get("country")
+    elif kind == "compare" and entity in COMPARISONS:
+        args.command, args.compare_type = "compare", entity
+        for item in (f"{entity}1", f"{entity}2"):
+            setattr(args, item, required_param(params, item))
+        args.genre = params.get("genre")
+    else:
+        return None
+    return args
+
+
+def compute_frame(args):
+    from ..lib.analyze import ranking_settings
+
+    with ranking_settings(args.engine):
+        return query_frame(args)
+
+
+def json_chunks(df):
+    yield b"["
+    for start in range(0, len(df), CHUNK_ROWS):
+        records = df.iloc[start : start + CHUNK_ROWS].to_json(
+            orient="records", force_ascii=False
+        )
+        # the records of the chunk without the brackets of their own array
+        yield ("," if start else "").encode() + records[1:-1].encode()
+    yield b"]\n"
+
+
+def ndjson_chunks(df):
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start : start + CHUNK_ROWS]
+        yield chunk.to_json(orient="records", lines=True, force_ascii=False).encode()
+
+
+def csv_chunks(df):
+    # an empty frame still gets its header
+    for start in range(0, len(df) or 1, CHUNK_ROWS):
+        chunk = df.iloc[start : start + CHUNK_ROWS]
+        yield chunk.to_csv(index=False, header=not start).encode()
+
+
+def arrow_chunks(df):
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+
+    def written():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(CHUNK_ROWS):
+            writer.write_batch(batch)
+            yield written()
+    yield written()
+
+
+ENCODERS = dict(
+    json=json_chunks, ndjson=ndjson_chunks, csv=csv_chunks, arrow=arrow_chunks
+)
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time, the calls made with a key while it is
+    computed wait for that computation instead of starting their own.
+    """
+
+    def __init__(self):
+        self.running = {}
+
+    async def run(self, key, compute):
+        task = self.running.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self.running[key] = task
+            task.add_done_callback(lambda _: self.running.pop(key, None))
+        # a caller going away does not cancel the computation the others wait for
+        return await asyncio.shield(task)
+
+
+def error_response(status, message):
+    body = json.dumps(dict(error=message)).encode() + b"\n"
+    return status, {"Content-Type": CONTENT_TYPES["json"]}, single_chunk(body)
+
+
+async def single_chunk(body):
+    yield body
+
+
+class QueryService:
+    """
+    Answers the queries over HTTP. `respond` is the whole service without the
+    connection, e.g. to call it in-process.
+    """
+
+    def __init__(self, threads=None):
+        self.pool = ThreadPoolExecutor(threads or os.cpu_count())
+        self.flights = SingleFlight()
+
+    def close(self):
+        self.pool.shutdown()
+
+    async def respond(self, method, target):
+        """(status, headers, body) answering `target`, the body yields bytes."""
+        if method != "GET":
+            return error_response(405, f"Method {method} not allowed, use GET")
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        output_format = params.pop("format", None) or "json"
+        if output_format not in ENCODERS:
+            return error_response(
+                400,
+                f"Unknown format {output_format!r}, expected one of {list(ENCODERS)}",
+            )
+        if output_format == "arrow" and find_spec("pyarrow") is None:
+            return error_response(406, "The arrow format needs pyarrow installed")
+        try:
+            args = query_args(url.path, params)
+        except ValueError as error:
+            return error_response(400, str(error))
+        if args is None:
+            return error_response(404, f"Unknown path {url.path}")
+        loop = asyncio.get_running_loop()
+        try:
+            df = await self.flights.run(
+                (url.path, tuple(sorted(params.items()))),
+                lambda: loop.run_in_executor(self.pool, compute_frame, args),
+            )
+        except ValueError as error:
+            return error_response(400, str(error))
+        except Exception as error:
+            return error_response(500, repr(error))
+        headers = {"Content-Type": CONTENT_TYPES[output_format]}
+        next_after = df.attrs.get("next_after")
+        if next_after:
+            key, last_id = next_after
+            headers["X-Next-After"] = f"{key!r},{last_id}"
+        return 200, headers, self.stream(ENCODERS[output_format](df))
+
+    async def stream(self, chunks):
+        """Encode the `chunks` generator one chunk at a time on the pool."""
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(self.pool, next, chunks, None)
+            if chunk is None:
+                return
+            if chunk:
+                yield chunk
+
+    async def handle(self, reader, writer):
+        """Answer the request on a connection, closed once its response is sent."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1")
+            # the headers and body of a GET do not change the response
+            while (await reader.readline()).strip():
+                pass
+            try:
+                method, target, _ = request_line.split(" ", 2)
+            except ValueError:
+                status, headers, body = error_response(400, "Malformed request line")
+            else:
+                status, headers, body = await self.respond(method, target)
+            head = [f"HTTP/1.1 {status} {REASONS[status]}"]
+            head += [f"{name}: {value}" for name, value in headers.items()]
+            head += ["Transfer-Encoding: chunked", "Connection: close", "", ""]
+            writer.write("\r\n".join(head).encode("latin-1"))
+            async for chunk in body:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                # waits while the client is slower than the encoding
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve_http(host=None, port=None, threads=None, ready=None):
+    """
+    Serve the queries on `host`:`port` until cancelled. `ready` is called with the
+    listening server, e.g. to read the port picked for port 0.
+    """
+    service = QueryService(threads)
+    server = await asyncio.start_server(
+        service.handle, host or HOST, PORT if port is None else port
+    )
+    try:
+        async with server:
+            if ready:
+                ready(server)
+            await server.serve_forever()
+    finally:
+        service.close()
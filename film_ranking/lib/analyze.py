@@ -1,159 +1,297 @@
-import sqlite3
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
 import pandas as pd
 from typing import Literal, Optional
 
+from . import fuzzy, vectorized
+from .cache import cached
+from .connections import DATABASE_PATH, get_read_connection
+from .query import (
+    COUNTRY_COLUMNS,
+    COUNTRY_RANKS,
+    TITLE_COLUMNS,
+    YEAR_RANGE,
+    actor_regions,
+    compose,
+    country_cinema_data,
+    limit_param,
+    listed_hits,
+    match_query,
+    page_clauses,
+    person_aggregates,
+    person_filter,
+    person_movies,
+    sort_column,
+)
+
 CinematicRankSort = Literal["impact_score", "awards_count"]
 
+COUNTRY_SORT_CHOICES = (
+    "population",
+    "gdp_capita",
+    "gdp",
+    "numFilms",
+    "votes",
+    "avgRating",
+    "qualityScore",
+    "populationPerFilm",
+    "filmPerGdp",
+    "gdpPerFilm",
+    "gdpCapitaPerFilm",
+    "gdp_rank",
+    "weak_cinematic_impact_rank",
+    "strong_cinematic_impact_rank",
+    "weak_cinematic_impact_difference",
+    "strong_cinematic_impact_difference",
+)
+CINEMATIC_SORT_COLUMNS = {"impact_score": "f.product", "awards_count": "f.awardsCount"}
+DIRECTOR_SORT_CHOICES = (
+    "movieCount",
+    "awardsCount",
+    "avgRating",
+    "totalVotes",
+    "totalProduct",
+    "moviesWithAwards",
+    "moviesWithoutAwards",
+    "finalAssessmentValue",
+    "awardPercentage",
+)
+PRODUCER_SORT_CHOICES = (
+    "movieCount",
+    "awardsCount",
+    "avgRating",
+    "totalVotes",
+    "totalProduct",
+)
+ACTOR_SORT_CHOICES = (
+    "movieCount",
+    "awardsCount",
+    "avgRating",
+    "totalVotes",
+    "totalProduct",
+    "countryCount",
+)
+
+ENGINES = ("sqlite", "numpy")
+# the workers are not forked from this process, which may be running threads
+POOL_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_settings = threading.local()
+
+
+@contextmanager
+def ranking_settings(engine=None, workers=None):
+    """
+    Engine and workers of the rankings run by this thread, over the environment
+    variables, e.g. for a request of a long running service.
+    """
+    previous = vars(_settings).copy()
+    _settings.engine, _settings.workers = engine, workers
+    try:
+        yield
+    finally:
+        vars(_settings).clear()
+        vars(_settings).update(previous)
+
+
+def ranking_engine():
+    """Engine computing the rankings, set with FILM_RANKING_ENGINE (default sqlite)."""
+    engine = getattr(_settings, "engine", None) or os.environ.get(
+        "FILM_RANKING_ENGINE", "sqlite"
+    )
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    return engine
+
 
-def get_connection(file="./processed_data/film.db"):
-    conn = sqlite3.connect(file)
-    return conn
+def ranking_workers():
+    """
+    Processes the SQL engine splits the people rankings over, set with
+    FILM_RANKING_WORKERS (default 1).
+    """
+    workers = getattr(_settings, "workers", None)
+    if workers is None:
+        workers = int(os.environ.get("FILM_RANKING_WORKERS", "1"))
+    return workers if workers > 0 else os.cpu_count()
 
 
-def search_movie(keyword: str, limit: int = 10):
-    conn = get_connection()
-    query = f"""
-    SELECT b.tconst, b.originalTitle, b.startYear, GROUP_CONCAT(DISTINCT (nb.primaryName))
-FROM basics b
-JOIN principals p on p.tconst = b.tconst
-JOIN name_basics nb on nb.nconst = p.nconst
-WHERE originalTitle = "{keyword}"
-GROUP BY b.tconst
-LIMIT {limit};
+def read_query(query: str, params: dict, db_path=DATABASE_PATH):
+    return pd.read_sql_query(query, get_read_connection(db_path), params=params)
+
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def ranking_pool(workers):
+    """
+    Process pool of the partitioned rankings, started once and shared by every
+    ranking of this process. It is replaced by a bigger one when a ranking asks for
+    more `workers` than it has.
     """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            context = multiprocessing.get_context(POOL_START_METHOD)
+            _pool = ProcessPoolExecutor(workers, mp_context=context)
+            _pool_size = workers
+        return _pool
+
+
+def read_ranking(query, params, id_column, sort_by, limit, workers):
+    """
+    Run a people ranking `query` built with partitioned filters on `workers`
+    processes of the ranking pool, each ranking the people of one partition on its
+    own connection, and merge their pages: the best rows of every partition hold the
+    best rows overall.
+    """
+    if workers <= 1:
+        return read_query(query, params)
+    partitions = [dict(params, partitions=workers, partition=i) for i in range(workers)]
+    # the workers may have been started from another working directory
+    db_path = os.path.abspath(DATABASE_PATH)
+    pages = list(
+        ranking_pool(workers).map(
+            read_query, [query] * workers, partitions, [db_path] * workers
+        )
+    )
+    # empty pages and columns without any value are untyped, the types of the
+    # merged columns are inferred from all their values
+    pages = [page.astype(object) for page in pages if len(page)] or pages
+    df = pd.concat(pages, ignore_index=True).infer_objects()
+    df = (
+        df.assign(rankingKey=pd.to_numeric(df[sort_by]).fillna(0))
+        .sort_values(["rankingKey", id_column], ascending=[False, True], kind="stable")
+        .drop(columns="rankingKey")
+        .reset_index(drop=True)
+    )
+    return df if limit is None else df.head(int(limit))
 
-    df = pd.read_sql_query(query, conn)
 
-    df.head()
+TITLE_MATCHES = """
+        SELECT tconst, MIN(rank) AS rank
+        FROM title_search
+        WHERE title_search MATCH :match
+        GROUP BY tconst
+        ORDER BY rank
+        LIMIT :limit
+    """
+NAME_MATCHES = """
+        SELECT nconst, rank
+        FROM name_search
+        WHERE name_search MATCH :match
+        ORDER BY rank
+        LIMIT :limit
+    """
 
-    conn.close()
-    return df
+
+def search_hits(query: str, matches: str, id_column: str, index: str, keyword, limit):
+    """
+    Run `query` over the full-text `matches` of `keyword`. When nothing matches, e.g.
+    because of a typo, over the entries of the trigram `index` closest to it instead.
+    """
+    params = dict(match=match_query(keyword), limit=limit_param(limit))
+    df = read_query(compose(dict(hits=matches), query), params)
+    if not df.empty or not keyword:
+        return df
+    entries = fuzzy.lookup(get_read_connection(), index, keyword, limit or 10)
+    ids = json.dumps([const for const, _, _ in entries])
+    return read_query(compose(dict(hits=listed_hits(id_column)), query), dict(ids=ids))
+
+
+@cached
+def search_movie(keyword: str, limit: int = 10):
+    """
+    Titles whose primary, original or aka title matches `keyword`, best first. Falls
+    back to the primary titles most similar to it when none does.
+    """
+    query = """
+    SELECT
+        b.tconst,
+        b.originalTitle,
+        b.startYear,
+        (
+            SELECT GROUP_CONCAT(DISTINCT nb.primaryName)
+            FROM principals p
+            JOIN name_basics nb ON nb.nconst = p.nconst
+            WHERE p.tconst = b.tconst
+        ) AS people
+    FROM hits
+    JOIN basics b ON b.tconst = hits.tconst
+    ORDER BY hits.rank;
+    """
+    return search_hits(query, TITLE_MATCHES, "tconst", "title_fuzzy", keyword, limit)
 
 
+@cached
 def search_person(keyword: str, limit: int = 10):
-    conn = get_connection()
-    query = f"""
+    """
+    People whose name matches `keyword`, best first. Falls back to the names most
+    similar to it when none does.
+    """
+    query = """
     SELECT nb.nconst, nb.primaryProfession,
        nb.primaryName,
        GROUP_CONCAT(b.primaryTitle) titles,
        b.genres
-FROM name_basics nb
-JOIN basics b
+FROM hits
+JOIN name_basics nb ON nb.nconst = hits.nconst
+LEFT JOIN basics b
     ON nb.knownForTitles = b.tconst
     OR SUBSTR(nb.knownForTitles, 1, INSTR(nb.knownForTitles, ',') - 1) = b.tconst
-WHERE primaryName = "{keyword}"
-GROUP BY nconst
-LIMIT {limit};
+GROUP BY nb.nconst
+ORDER BY MIN(hits.rank);
     """
-
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
+    return search_hits(query, NAME_MATCHES, "nconst", "name_fuzzy", keyword, limit)
+
+
+def set_next_page(df, id_column: str, sort_by: str, limit=None):
+    """Store the `after` cursor of the page following `df` in df.attrs["next_after"]."""
+    if limit and len(df) == int(limit):
+        last = df.iloc[-1]
+        key = 0 if pd.isna(last[sort_by]) else last[sort_by]
+        # numpy scalars can not be bound as query parameters
+        key = key.item() if hasattr(key, "item") else key
+        df.attrs["next_after"] = (key, last[id_column])
+    else:
+        df.attrs["next_after"] = None
     return df
 
 
+@cached
 def get_movies_with_regional_data(yearStart: int, yearEnd: int, sort_by=None):
-    conn = get_connection()
-
-    query = f"""
-    WITH ranked_regions AS (
-    SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
-    FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        b.startYear >= {yearStart} AND b.startYear <= {yearEnd}
-        AND LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    country_cinema_data AS (
-        SELECT
-            o.region,
-            countries.country AS countryName,
-            countries.population,
-            countries.gdp_capita,
-            countries.gdp_capita * countries.population AS gdp,
-            COUNT(o.titleId) AS numFilms,
-            SUM(r.numVotes) AS votes,
-            AVG(r.averageRating) AS avgRating,
-            SUM(r.numVotes) * AVG(r.averageRating) AS qualityScore,
-            CAST(countries.population / COUNT(o.titleId) AS FLOAT) AS populationPerFilm,
-            CAST(COUNT(o.titleId) / (countries.gdp_capita * countries.population) AS FLOAT) AS filmPerGdp,
-            CAST((countries.gdp_capita * countries.population) / COUNT(o.titleId) AS FLOAT) AS gdpPerFilm,
-            CAST(COUNT(o.titleId) / countries.gdp_capita AS FLOAT) AS gdpCapitaPerFilm
-        FROM
-            original_regions o
-        JOIN ratings r ON o.titleId = r.tconst
-        JOIN countries ON countries.abbreviation = o.region
-        GROUP BY
-            o.region
-    ),
-    country_ranks AS (
-        SELECT
-            countryName,
-            gdp,
-            numFilms,
-            qualityScore,
-            ROW_NUMBER() OVER (ORDER BY gdp DESC) AS gdp_rank,
-            ROW_NUMBER() OVER (ORDER BY numFilms DESC) AS weak_cinematic_impact_rank,
-            ROW_NUMBER() OVER (ORDER BY qualityScore DESC) AS strong_cinematic_impact_rank
-        FROM
-            country_cinema_data
+    order = sort_column(sort_by or "qualityScore", COUNTRY_SORT_CHOICES)
+    if ranking_engine() == "numpy":
+        return vectorized.get_movies_with_regional_data(
+            yearStart, yearEnd, sort_by or "qualityScore"
+        )
+    query = compose(
+        dict(
+            country_cinema_data=country_cinema_data(
+                "country_year_stats",
+                films="SUM(c.numFilms)",
+                votes="SUM(c.votes)",
+                avg_rating="(SUM(c.sumRatings) / SUM(c.numFilms))",
+                where=YEAR_RANGE.format(table="c"),
+            ),
+            country_ranks=COUNTRY_RANKS,
+        ),
+        f"SELECT {COUNTRY_COLUMNS} ORDER BY {order} DESC;",
     )
-    SELECT
-        ccd.region AS region,
-        ccd.countryName,
-        ccd.population AS population,
-        ccd.gdp_capita AS gdp_capita,
-        ccd.gdp AS gdp,
-        ccd.numFilms AS numFilms,
-        ccd.votes AS votes,
-        ccd.avgRating AS avgRating,
-        ccd.qualityScore AS qualityScore,
-        ccd.populationPerFilm,
-        ccd.filmPerGdp,
-        ccd.gdpPerFilm,
-        ccd.gdpCapitaPerFilm,
-        cr.gdp_rank,
-        cr.weak_cinematic_impact_rank,
-        cr.strong_cinematic_impact_rank,
-        (cr.gdp_rank - cr.weak_cinematic_impact_rank) AS weak_cinematic_impact_difference,
-        (cr.gdp_rank - cr.strong_cinematic_impact_rank) AS strong_cinematic_impact_difference
-    FROM
-        country_cinema_data ccd
-    JOIN
-        country_ranks cr ON ccd.countryName = cr.countryName
-    ORDER BY {'"' + sort_by + '"' if sort_by else "qualityScore" } DESC;
-    """
-
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
+    return read_query(query, dict(year_start=yearStart, year_end=yearEnd))
 
 
+@cached
 def get_cinematic_rank(
     year_start: int,
     year_end: int,
@@ -163,579 +301,283 @@ def get_cinematic_rank(
     country=None,
     sort_by: Optional[CinematicRankSort] = None,
 ):
-    conn = get_connection()
-
+    sort_by = sort_by or "impact_score"
+    sort_column(sort_by, tuple(CINEMATIC_SORT_COLUMNS))
+    order = CINEMATIC_SORT_COLUMNS[sort_by]
+    if ranking_engine() == "numpy":
+        return vectorized.get_cinematic_rank(
+            year_start, year_end, limit, genre, mtype, country, sort_by
+        )
+    filters = [YEAR_RANGE.format(table="f")]
+    if genre:
+        filters.append("f.genres = :genre")
+    if mtype:
+        filters.append("f.titleType = :mtype")
+    if country:
+        filters.append("f.region = :country")
     query = f"""
-    WITH ranked_regions AS (
     SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
-    FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
+        f.tconst AS titleId,
+        {TITLE_COLUMNS}
     WHERE
-        b.startYear >= {year_start} AND b.startYear <= {year_end}
-        {"AND b.genres =" + '"' + genre + '"' if genre else ""}
-        {"AND b.titleType = " + '"' + mtype + '"' if mtype else ""}
-        AND LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND length(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awards_count
-        FROM
-            awards
-        GROUP BY
-            const
-    )
-    SELECT
-        o.titleId,
-        o.primaryTitle,
-        o.region,
-        r.numVotes,
-        r.averageRating,
-        r.averageRating * r.numVotes AS product,
-        a.awards,
-        a.awards_count
-    FROM
-        original_regions o
-    JOIN
-        ratings r ON o.titleId = r.tconst
-    LEFT JOIN
-        awards_concat a ON o.titleId = a.const
-    {"WHERE o.region = " + '"' + country + '"' if country else ""}
-    ORDER BY {"awards_count" if sort_by == "awards_count" else "product" } DESC
-    {"LIMIT " + str(limit) if limit else ""};
+        {" AND ".join(filters)}
+    ORDER BY {order} DESC
+    LIMIT :limit;
     """
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
-
+    params = dict(
+        year_start=year_start,
+        year_end=year_end,
+        genre=genre,
+        mtype=mtype,
+        country=country,
+        limit=limit_param(limit),
+    )
+    return read_query(query, params)
 
-def get_directors_rank(yearStart: int, yearEnd: int, sort_by=None):
-    conn = get_connection()
 
-    query = f"""
-    WITH ranked_regions AS (
-    SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
-    FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        b.startYear >= {yearStart} AND b.startYear <= {yearEnd}
-        AND LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awardsCount
-        FROM
-            awards
-        GROUP BY
-            const
-    ),
-    director_movies AS (
-        SELECT
-            p.nconst AS directorId,
-            p.tconst AS movieId,
-            b.primaryTitle,
-            r.averageRating,
-            r.numVotes,
-            r.averageRating * r.numVotes AS product,
-            COALESCE(a.awardsCount, 0) AS hasAwards
-        FROM
-            principals p
-        JOIN
-            basics b ON p.tconst = b.tconst
-        JOIN
-            ratings r ON p.tconst = r.tconst
+@cached
+def get_directors_rank(
+    yearStart: int, yearEnd: int, sort_by=None, limit=None, after=None
+):
+    """
+    Directors ranked by `sort_by` (default finalAssessmentValue). With `limit` only
+    that many are returned, continuing after the `after` cursor when given (see
+    set_next_page). The movie lists are only built for the returned page.
+    """
+    sort_by = sort_by or "finalAssessmentValue"
+    order = sort_column(sort_by, DIRECTOR_SORT_CHOICES)
+    if ranking_engine() == "numpy":
+        df = vectorized.get_directors_rank(yearStart, yearEnd, sort_by, limit, after)
+        return set_next_page(df, "directorId", sort_by, limit)
+    workers = ranking_workers()
+    where, order, params = page_clauses("directorId", order, after)
+    query = compose(
+        dict(
+            director_aggregates=person_aggregates(person_filter("s", workers > 1)),
+            ranking="""
+        SELECT
+            da.nconst AS directorId,
+            n.primaryName AS directorName,
+            da.movieCount,
+            a.awards,
+            a.awardsCount,
+            da.avgRating,
+            da.totalVotes,
+            da.totalProduct,
+            da.moviesWithAwards,
+            da.moviesWithoutAwards,
+            ((3 * da.moviesWithAwards + 1 * da.moviesWithoutAwards)/da.movieCount) * da.avgRating *da.totalVotes AS finalAssessmentValue,
+            (da.moviesWithAwards * 100 / da.movieCount) AS awardPercentage
+        FROM
+            director_aggregates da
         JOIN
-            original_regions o ON p.tconst = o.titleId
+            name_basics n ON da.nconst = n.nconst
         LEFT JOIN
-            awards_concat a ON p.tconst = a.const
-        WHERE
-            p.category = 'director'
-    ),
-    director_aggregates AS (
-        SELECT
-            d.directorId,
-            COUNT(d.movieId) AS movie_count,
-            GROUP_CONCAT(d.primaryTitle) AS movies,
-            AVG(d.averageRating) AS avgRating,
-            SUM(d.numVotes) AS totalVotes,
-            AVG(d.averageRating) * SUM(d.numVotes) AS totalProduct,
-            SUM(CASE WHEN d.hasAwards > 0 THEN 1 ELSE 0 END) AS moviesWithAwards,
-            SUM(CASE WHEN d.hasAwards = 0 THEN 1 ELSE 0 END) AS moviesWithoutAwards
-        FROM
-            director_movies d
-        GROUP BY
-            d.directorId
-    )
-    SELECT
-        da.directorId,
-        n.primaryName AS directorName,
-        da.movies,
-        da.movie_count AS movieCount,
-        a.awards,
-        a.awardsCount AS awardsCount,
-        da.avgRating AS avgRating,
-        da.totalVotes,
-        da.totalProduct,
-        da.moviesWithAwards AS moviesWithAwards,
-        da.moviesWithoutAwards,
-        ((3 * da.moviesWithAwards + 1 * da.moviesWithoutAwards)/da.movie_count) * da.avgRating *da.totalVotes AS finalAssessmentValue,
-        (da.moviesWithAwards * 100 / da.movie_count) AS awardPercentage
-    FROM
-        director_aggregates da
-    JOIN
-        name_basics n ON da.directorId = n.nconst
-    LEFT JOIN
-        awards_concat a ON a.const = da.directorId
-    ORDER BY {'"' + sort_by + '"' if sort_by else "finalAssessmentValue" } DESC;
-"""
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
-
-
-def get_producers_rank(yearStart: int, yearEnd: int, sort_by=None):
-    conn = get_connection()
-
-    query = f"""
-    WITH ranked_regions AS (
+            award_stats a ON a.const = da.nconst
+    """,
+            page=f"SELECT * FROM ranking {where} {order} LIMIT :limit",
+        ),
+        f"""
     SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
+        directorId,
+        directorName,
+        {person_movies("p.directorId", YEAR_RANGE.format(table="s"))} AS movies,
+        movieCount,
+        awards,
+        awardsCount,
+        avgRating,
+        totalVotes,
+        totalProduct,
+        moviesWithAwards,
+        moviesWithoutAwards,
+        finalAssessmentValue,
+        awardPercentage
     FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        b.startYear >= {yearStart} AND b.startYear <= {yearEnd}
-        AND LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awardsCount
-        FROM
-            awards
-        GROUP BY
-            const
-    ),
-    producer_movies AS (
-        SELECT
-            p.nconst AS producerId,
-            p.tconst AS movieId,
-            b.primaryTitle,
-            r.averageRating,
-            r.numVotes,
-            r.averageRating * r.numVotes AS product
-        FROM
-            principals p
-        JOIN
-            basics b ON p.tconst = b.tconst
-        JOIN
-            ratings r ON p.tconst = r.tconst
-        JOIN
-            original_regions o ON p.tconst = o.titleId
-        WHERE
-            p.category = 'producer'
-    ),
-    producer_aggregates AS (
-        SELECT
-            p.producerId,
-            COUNT(p.movieId) AS movie_count,
-            GROUP_CONCAT(p.primaryTitle) AS movies,
-            AVG(p.averageRating) AS avgRating,
-            SUM(p.numVotes) AS totalVotes,
-            AVG(p.averageRating) * SUM(p.numVotes) AS totalProduct
-        FROM
-            producer_movies p
-        GROUP BY
-            p.producerId
+        page p
+    {order};
+    """,
     )
-    SELECT
-        pa.producerId,
-        n.primaryName AS producerName,
-        pa.movies AS movie,
-        pa.movie_count AS movieCount,
-        a.awards,
-        a.awardsCount AS awardsCount,
-        pa.avgRating AS avgRating,
-        pa.totalVotes,
-        pa.totalProduct AS totalProduct
-    FROM
-        producer_aggregates pa
-    JOIN
-        name_basics n ON pa.producerId = n.nconst
-    LEFT JOIN
-        awards_concat a ON a.const = pa.producerId
-    ORDER BY {'"' + sort_by + '"' if sort_by else "totalProduct" } DESC;
-"""
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
-
+    params.update(
+        role="director",
+        year_start=yearStart,
+        year_end=yearEnd,
+        limit=limit_param(limit),
+    )
+    df = read_ranking(query, params, "directorId", sort_by, limit, workers)
+    return set_next_page(df, "directorId", sort_by, limit)
 
-def get_actors_rank(yearStart: int, yearEnd: int, sort_by=None):
-    conn = get_connection()
 
-    query = f"""
-    WITH ranked_regions AS (
-    SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
-    FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        b.startYear >= {yearStart} AND b.startYear <= {yearEnd}
-        AND LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awardsCount
-        FROM
-            awards
-        GROUP BY
-            const
-    ),
-    actor_movies AS (
-        SELECT
-            p.nconst AS actorId,
-            p.tconst AS movieId,
-            b.primaryTitle,
-            r.averageRating,
-            r.numVotes,
-            r.averageRating * r.numVotes AS product,
-            o.region
-        FROM
-            principals p
-        JOIN
-            basics b ON p.tconst = b.tconst
-        JOIN
-            ratings r ON p.tconst = r.tconst
-        JOIN
-            original_regions o ON p.tconst = o.titleId
-        WHERE
-            p.category = 'actor' OR 'actress'
-    ),
-    actor_aggregates AS (
-        SELECT
-            p.actorId,
-            COUNT(p.movieId) AS movieCount,
-            GROUP_CONCAT(DISTINCT p.primaryTitle) AS movies,
-            AVG(p.averageRating) AS avgRating,
-            SUM(p.numVotes) AS totalVotes,
-            AVG(p.averageRating) * SUM(p.numVotes) AS totalProduct,
-            GROUP_CONCAT(DISTINCT p.region) AS regions,
-            COUNT(DISTINCT p.region) AS countryCount
-        FROM
-            actor_movies p
-        GROUP BY
-            p.actorId
-    )
-        SELECT
-            aa.actorId,
-            n.primaryName AS actorName,
-            aa.movies,
-            aa.movieCount AS movieCount,
+@cached
+def get_producers_rank(
+    yearStart: int, yearEnd: int, sort_by=None, limit=None, after=None
+):
+    """
+    Producers ranked by `sort_by` (default totalProduct), paged like
+    get_directors_rank.
+    """
+    sort_by = sort_by or "totalProduct"
+    order = sort_column(sort_by, PRODUCER_SORT_CHOICES)
+    if ranking_engine() == "numpy":
+        df = vectorized.get_producers_rank(yearStart, yearEnd, sort_by, limit, after)
+        return set_next_page(df, "producerId", sort_by, limit)
+    workers = ranking_workers()
+    where, order, params = page_clauses("producerId", order, after)
+    query = compose(
+        dict(
+            producer_aggregates=person_aggregates(person_filter("s", workers > 1)),
+            ranking="""
+        SELECT
+            pa.nconst AS producerId,
+            n.primaryName AS producerName,
+            pa.movieCount,
             a.awards,
-            a.awardsCount AS awardsCount,
-            aa.avgRating AS avgRating,
-            aa.totalVotes,
-            aa.totalProduct,
-            aa.regions,
-            aa.countryCount AS countryCount
+            a.awardsCount,
+            pa.avgRating,
+            pa.totalVotes,
+            pa.totalProduct
         FROM
-            actor_aggregates aa
+            producer_aggregates pa
         JOIN
-            name_basics n ON aa.actorId = n.nconst
+            name_basics n ON pa.nconst = n.nconst
         LEFT JOIN
-            awards_concat a ON a.const = aa.actorId
-        ORDER BY {'"' + sort_by + '"' if sort_by else "awardsCount" } DESC;
-"""
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
-
-
-def actors_comparison(actorId1: str, actorId2: str):
-    conn = get_connection()
-
-    query = f"""
-    WITH ranked_regions AS (
+            award_stats a ON a.const = pa.nconst
+    """,
+            page=f"SELECT * FROM ranking {where} {order} LIMIT :limit",
+        ),
+        f"""
     SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
+        producerId,
+        producerName,
+        {person_movies("p.producerId", YEAR_RANGE.format(table="s"))} AS movie,
+        movieCount,
+        awards,
+        awardsCount,
+        avgRating,
+        totalVotes,
+        totalProduct
     FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awardsCount
-        FROM
-            awards
-        GROUP BY
-            const
-    ),
-    actor_movies AS (
-        SELECT
-            p.nconst AS actorId,
-            p.tconst AS movieId,
-            b.primaryTitle,
-            r.averageRating,
-            r.numVotes,
-            r.averageRating * r.numVotes AS product,
-            o.region
-        FROM
-            principals p
-        JOIN
-            basics b ON p.tconst = b.tconst
-        JOIN
-            ratings r ON p.tconst = r.tconst
-        JOIN
-            original_regions o ON p.tconst = o.titleId
-        WHERE
-            p.category = 'actor' OR 'actress'
-    ),
-    actor_aggregates AS (
-        SELECT
-            p.actorId,
-            COUNT(p.movieId) AS movieCount,
-            GROUP_CONCAT(DISTINCT p.primaryTitle) AS movies,
-            AVG(p.averageRating) AS avgRating,
-            SUM(p.numVotes) AS totalVotes,
-            AVG(p.averageRating) * SUM(p.numVotes) AS totalProduct,
-            GROUP_CONCAT(DISTINCT p.region) AS regions,
-            COUNT(DISTINCT p.region) AS countryCount
-        FROM
-            actor_movies p
-        WHERE
-            actorId IN ('{actorId1}', '{actorId2}')
-        GROUP BY
-            p.actorId
+        page p
+    {order};
+    """,
     )
-        SELECT
-            aa.actorId,
+    params.update(
+        role="producer",
+        year_start=yearStart,
+        year_end=yearEnd,
+        limit=limit_param(limit),
+    )
+    df = read_ranking(query, params, "producerId", sort_by, limit, workers)
+    return set_next_page(df, "producerId", sort_by, limit)
+
+
+@cached
+def get_actors_rank(yearStart: int, yearEnd: int, sort_by=None, limit=None, after=None):
+    """
+    Actors and actresses ranked by `sort_by` (default awardsCount), paged like
+    get_directors_rank.
+    """
+    sort_by = sort_by or "awardsCount"
+    order = sort_column(sort_by, ACTOR_SORT_CHOICES)
+    if ranking_engine() == "numpy":
+        df = vectorized.get_actors_rank(yearStart, yearEnd, sort_by, limit, after)
+        return set_next_page(df, "actorId", sort_by, limit)
+    workers = ranking_workers()
+    where, order, params = page_clauses("actorId", order, after)
+    query = compose(
+        dict(
+            actor_regions=actor_regions(person_filter("r", workers > 1)),
+            actor_aggregates=person_aggregates(person_filter("s", workers > 1)),
+            ranking="""
+        SELECT
+            aa.nconst AS actorId,
             n.primaryName AS actorName,
-            aa.movies,
             aa.movieCount,
             a.awards,
             a.awardsCount,
             aa.avgRating,
             aa.totalVotes,
             aa.totalProduct,
-            aa.regions,
-            aa.countryCount
+            ar.regions,
+            ar.countryCount
         FROM
             actor_aggregates aa
         JOIN
-            name_basics n ON aa.actorId = n.nconst
+            name_basics n ON aa.nconst = n.nconst
+        JOIN
+            actor_regions ar ON ar.nconst = aa.nconst
         LEFT JOIN
-            awards_concat a ON a.const = aa.actorId
-    """
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
-
+            award_stats a ON a.const = aa.nconst
+    """,
+            page=f"SELECT * FROM ranking {where} {order} LIMIT :limit",
+        ),
+        f"""
+    SELECT
+        actorId,
+        actorName,
+        {person_movies("p.actorId", YEAR_RANGE.format(table="s"))} AS movies,
+        movieCount,
+        awards,
+        awardsCount,
+        avgRating,
+        totalVotes,
+        totalProduct,
+        regions,
+        countryCount
+    FROM
+        page p
+    {order};
+    """,
+    )
+    params.update(
+        role="actor", year_start=yearStart, year_end=yearEnd, limit=limit_param(limit)
+    )
+    df = read_ranking(query, params, "actorId", sort_by, limit, workers)
+    return set_next_page(df, "actorId", sort_by, limit)
 
-def directors_comparison(directorId1: str, directorId2: str):
-    conn = get_connection()
 
-    query = f"""
-    WITH ranked_regions AS (
+@cached
+def actors_comparison(actorId1: str, actorId2: str):
+    query = compose(
+        dict(
+            actor_regions=actor_regions("r.nconst IN (:id1, :id2)"),
+            actor_aggregates=person_aggregates("s.nconst IN (:id1, :id2)"),
+        ),
+        f"""
     SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
+        aa.nconst AS actorId,
+        n.primaryName AS actorName,
+        {person_movies("aa.nconst")} AS movies,
+        aa.movieCount,
+        a.awards,
+        a.awardsCount,
+        aa.avgRating,
+        aa.totalVotes,
+        aa.totalProduct,
+        ar.regions,
+        ar.countryCount
     FROM
-        akas a
+        actor_aggregates aa
     JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awardsCount
-        FROM
-            awards
-        GROUP BY
-            const
-    ),
-    director_movies AS (
-        SELECT
-            p.nconst AS directorId,
-            p.tconst AS movieId,
-            b.primaryTitle,
-            r.averageRating,
-            r.numVotes,
-            r.averageRating * r.numVotes AS product,
-            COALESCE(a.awardsCount, 0) AS hasAwards
-        FROM
-            principals p
-        JOIN
-            basics b ON p.tconst = b.tconst
-        JOIN
-            ratings r ON p.tconst = r.tconst
-        JOIN
-            original_regions o ON p.tconst = o.titleId
-        LEFT JOIN
-            awards_concat a ON p.tconst = a.const
-        WHERE
-            p.category = 'director'
-            AND p.nconst IN ('{directorId1}', '{directorId2}')
-    ),
-    director_aggregates AS (
-        SELECT
-            d.directorId,
-            COUNT(d.movieId) AS movie_count,
-            GROUP_CONCAT(d.primaryTitle) AS movies,
-            AVG(d.averageRating) AS avgRating,
-            SUM(d.numVotes) AS totalVotes,
-            AVG(d.averageRating) * SUM(d.numVotes) AS totalProduct,
-            SUM(CASE WHEN d.hasAwards > 0 THEN 1 ELSE 0 END) AS moviesWithAwards,
-            SUM(CASE WHEN d.hasAwards = 0 THEN 1 ELSE 0 END) AS moviesWithoutAwards
-        FROM
-            director_movies d
-        GROUP BY
-            d.directorId
+        name_basics n ON aa.nconst = n.nconst
+    JOIN
+        actor_regions ar ON ar.nconst = aa.nconst
+    LEFT JOIN
+        award_stats a ON a.const = aa.nconst
+    """,
     )
+    return read_query(query, dict(role="actor", id1=actorId1, id2=actorId2))
+
+
+@cached
+def directors_comparison(directorId1: str, directorId2: str):
+    query = compose(
+        dict(director_aggregates=person_aggregates("s.nconst IN (:id1, :id2)")),
+        f"""
     SELECT
-        da.directorId,
+        da.nconst AS directorId,
         n.primaryName AS directorName,
-        da.movies AS movie,
-        da.movie_count AS movieCount,
+        {person_movies("da.nconst")} AS movie,
+        da.movieCount,
         a.awards,
         a.awardsCount,
         da.avgRating,
@@ -743,102 +585,29 @@ def directors_comparison(directorId1: str, directorId2: str):
         da.totalProduct,
         da.moviesWithAwards,
         da.moviesWithoutAwards,
-        ((3 * da.moviesWithAwards + 1 * da.moviesWithoutAwards)/da.movie_count) * da.avgRating *da.totalVotes AS finalAssessmentValue,
-        (da.moviesWithAwards * 100 / da.movie_count) AS awardPercentage
+        ((3 * da.moviesWithAwards + 1 * da.moviesWithoutAwards)/da.movieCount) * da.avgRating *da.totalVotes AS finalAssessmentValue,
+        (da.moviesWithAwards * 100 / da.movieCount) AS awardPercentage
     FROM
         director_aggregates da
     JOIN
-        name_basics n ON da.directorId = n.nconst
+        name_basics n ON da.nconst = n.nconst
     LEFT JOIN
-        awards_concat a ON a.const = da.directorId
-    """
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
+        award_stats a ON a.const = da.nconst
+    """,
+    )
+    return read_query(query, dict(role="director", id1=directorId1, id2=directorId2))
 
 
+@cached
 def producers_comparison(producerId1: str, producerId2: str):
-    conn = get_connection()
-
-    query = f"""
-    WITH ranked_regions AS (
-    SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
-    FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awardsCount
-        FROM
-            awards
-        GROUP BY
-            const
-    ),
-    producer_movies AS (
-        SELECT
-            p.nconst AS producerId,
-            p.tconst AS movieId,
-            b.primaryTitle,
-            r.averageRating,
-            r.numVotes,
-            r.averageRating * r.numVotes AS product
-        FROM
-            principals p
-        JOIN
-            basics b ON p.tconst = b.tconst
-        JOIN
-            ratings r ON p.tconst = r.tconst
-        JOIN
-            original_regions o ON p.tconst = o.titleId
-        WHERE
-            p.category = 'producer'
-            AND p.nconst IN ('{producerId1}', '{producerId2}')
-    ),
-    producer_aggregates AS (
-        SELECT
-            p.producerId,
-            COUNT(p.movieId) AS movie_count,
-            GROUP_CONCAT(p.primaryTitle) AS movies,
-            AVG(p.averageRating) AS avgRating,
-            SUM(p.numVotes) AS totalVotes,
-            AVG(p.averageRating) * SUM(p.numVotes) AS totalProduct
-        FROM
-            producer_movies p
-        GROUP BY
-            p.producerId
-    )
+    query = compose(
+        dict(producer_aggregates=person_aggregates("s.nconst IN (:id1, :id2)")),
+        f"""
     SELECT
-        pa.producerId,
+        pa.nconst AS producerId,
         n.primaryName AS producerName,
-        pa.movies AS movie,
-        pa.movie_count AS movieCount,
+        {person_movies("pa.nconst")} AS movie,
+        pa.movieCount,
         a.awards,
         a.awardsCount,
         pa.avgRating,
@@ -847,185 +616,44 @@ def producers_comparison(producerId1: str, producerId2: str):
     FROM
         producer_aggregates pa
     JOIN
-        name_basics n ON pa.producerId = n.nconst
+        name_basics n ON pa.nconst = n.nconst
     LEFT JOIN
-        awards_concat a ON a.const = pa.producerId
+        award_stats a ON a.const = pa.nconst
     ORDER BY
         pa.totalProduct DESC;
-    """
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
+    """,
+    )
+    return read_query(query, dict(role="producer", id1=producerId1, id2=producerId2))
 
 
+@cached
 def movies_comparison(movieId1: str, movieId2: str):
-    conn = get_connection()
-
     query = f"""
-    WITH ranked_regions AS (
     SELECT
-        a.titleId,
-        b.titleType,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
-    FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
+        f.tconst AS titleId,
+        f.titleType,
+        {TITLE_COLUMNS}
     WHERE
-        LOWER(a.title) = LOWER(b.primaryTitle)
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND length(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            titleType,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-            AND titleId IN ('{movieId1}', '{movieId2}')
-    ),
-    awards_concat AS (
-        SELECT
-            const,
-            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', ') AS awards,
-            COUNT(*) AS awards_count
-        FROM
-            awards
-        GROUP BY
-            const
-    )
-    SELECT
-        o.titleId,
-        o.titleType,
-        o.primaryTitle,
-        o.region,
-        r.numVotes,
-        r.averageRating,
-        r.averageRating * r.numVotes AS product,
-        a.awards,
-        a.awards_count
-    FROM
-        original_regions o
-    JOIN
-        ratings r ON o.titleId = r.tconst
-    LEFT JOIN
-        awards_concat a ON o.titleId = a.const
-    ORDER BY product DESC
+        f.tconst IN (:id1, :id2)
+    ORDER BY f.product DESC
     """
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
+    return read_query(query, dict(id1=movieId1, id2=movieId2))
 
 
+@cached
 def countries_comparison(country1: str, country2: str, genre=None):
-    conn = get_connection()
-
-    query = f"""
-    WITH ranked_regions AS (
-    SELECT
-        a.titleId,
-        b.primaryTitle,
-        a.region,
-        a.ordering,
-        ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
-    FROM
-        akas a
-    JOIN
-        basics b ON a.titleId = b.tconst
-    WHERE
-        LOWER(a.title) = LOWER(b.primaryTitle)
-        {" AND b.genres = " "'" + genre + "'" if genre else ""}
-        AND a.isOriginalTitle = 0
-        AND a.region != '\\N'
-        AND LENGTH(a.region) < 3
-    ),
-    original_regions AS (
-        SELECT
-            titleId,
-            primaryTitle,
-            region
-        FROM
-            ranked_regions
-        WHERE
-            rank = 1
-    ),
-    country_cinema_data AS (
-        SELECT
-            o.region,
-            countries.country AS countryName,
-            countries.population,
-            countries.gdp_capita,
-            countries.gdp_capita * countries.population AS gdp,
-            COUNT(o.titleId) AS numFilms,
-            SUM(r.numVotes) AS votes,
-            AVG(r.averageRating) AS avgRating,
-            SUM(r.numVotes) * AVG(r.averageRating) AS qualityScore,
-            CAST(countries.population / COUNT(o.titleId) AS FLOAT) AS populationPerFilm,
-            CAST(COUNT(o.titleId) / (countries.gdp_capita * countries.population) AS FLOAT) AS filmPerGdp,
-            CAST((countries.gdp_capita * countries.population) / COUNT(o.titleId) AS FLOAT) AS gdpPerFilm,
-            CAST(COUNT(o.titleId) / countries.gdp_capita AS FLOAT) AS gdpCapitaPerFilm
-        FROM
-            original_regions o
-        JOIN ratings r ON o.titleId = r.tconst
-        JOIN countries ON countries.abbreviation = o.region
-        GROUP BY
-            o.region
-    ),
-    country_ranks AS (
-        SELECT
-            countryName,
-            gdp,
-            numFilms,
-            qualityScore,
-            ROW_NUMBER() OVER (ORDER BY gdp DESC) AS gdp_rank,
-            ROW_NUMBER() OVER (ORDER BY numFilms DESC) AS weak_cinematic_impact_rank,
-            ROW_NUMBER() OVER (ORDER BY qualityScore DESC) AS strong_cinematic_impact_rank
-        FROM
-            country_cinema_data
+    # genres are not bucketed, so the titles are aggregated directly
+    query = compose(
+        dict(
+            country_cinema_data=country_cinema_data(
+                "title_facts",
+                films="COUNT(c.tconst)",
+                votes="SUM(c.numVotes)",
+                avg_rating="AVG(c.averageRating)",
+                where="c.genres = :genre" if genre else None,
+            ),
+            country_ranks=COUNTRY_RANKS,
+        ),
+        f"SELECT {COUNTRY_COLUMNS} WHERE ccd.region IN (:id1, :id2)",
     )
-    SELECT
-        ccd.region,
-        ccd.countryName,
-        ccd.population,
-        ccd.gdp_capita,
-        ccd.gdp,
-        ccd.numFilms,
-        ccd.votes,
-        ccd.avgRating,
-        ccd.qualityScore,
-        ccd.populationPerFilm,
-        ccd.filmPerGdp,
-        ccd.gdpPerFilm,
-        ccd.gdpCapitaPerFilm,
-        cr.gdp_rank,
-        cr.weak_cinematic_impact_rank,
-        cr.strong_cinematic_impact_rank,
-        (cr.gdp_rank - cr.weak_cinematic_impact_rank) AS weak_cinematic_impact_difference,
-        (cr.gdp_rank - cr.strong_cinematic_impact_rank) AS strong_cinematic_impact_difference
-    FROM
-        country_cinema_data ccd
-    JOIN
-        country_ranks cr ON ccd.countryName = cr.countryName
-    WHERE ccd.region IN ('{country1}', '{country2}')
-
-    """
-    df = pd.read_sql_query(query, conn)
-
-    df.head()
-
-    conn.close()
-    return df
+    return read_query(query, dict(id1=country1, id2=country2, genre=genre))
@@ -0,0 +1,166 @@
+"""
+Prefix autocomplete of titles and names, most popular first. `<index>_completions`
+holds every entry clustered on its normalized text, so the entries starting with a
+prefix are one contiguous range. For prefixes shared by more than HOT_RANGE entries
+`<index>_completion_tops` keeps the TOP_COMPLETIONS most popular ones, the other
+ranges are short enough to be sorted on demand.
+"""
+
+from .connections import get_read_connection
+from .fuzzy import words
+
+TOP_COMPLETIONS = 10
+HOT_RANGE = 128
+# sorts after any character a normalized text holds, closing a prefix range
+PREFIX_END = "\U0010ffff"
+
+TITLE_ENTRIES = """
+    SELECT b.tconst AS const, b.primaryTitle AS label, COALESCE(r.numVotes, 0) AS votes
+    FROM basics b
+    LEFT JOIN ratings r ON r.tconst = b.tconst
+    WHERE b.primaryTitle IS NOT NULL
+"""
+# votes of every title a person is credited on, once per title
+PERSON_ENTRIES = """
+    SELECT nb.nconst AS const, nb.primaryName AS label, COALESCE(v.votes, 0) AS votes
+    FROM name_basics nb
+    LEFT JOIN (
+        SELECT p.nconst, SUM(r.numVotes) AS votes
+        FROM (SELECT DISTINCT tconst, nconst FROM principals) p
+        JOIN ratings r ON r.tconst = p.tconst
+        GROUP BY p.nconst
+    ) v ON v.nconst = nb.nconst
+    WHERE nb.primaryName IS NOT NULL
+"""
+
+
+def completion_key(text):
+    return " ".join(words(text or ""))
+
+
+def build_completions(cursor, index, source):
+    """
+    Build the completion tables of `index` from the const, label and votes columns of
+    the `source` query. The tops of a prefix are computed from the hot prefixes one
+    character shorter, so each depth only reads the ranges that are still hot.
+    """
+    cursor.connection.create_function(
+        "completion_key", 1, completion_key, deterministic=True
+    )
+    cursor.execute(f"DROP TABLE IF EXISTS {index}_completions")
+    cursor.execute(f"DROP TABLE IF EXISTS {index}_completion_tops")
+    cursor.execute(
+        f"""
+        CREATE TABLE {index}_completions (
+            key TEXT,
+            const TEXT,
+            label TEXT,
+            votes INTEGER,
+            PRIMARY KEY (key, const)
+        ) WITHOUT ROWID
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TABLE {index}_completion_tops (
+            prefix TEXT,
+            rank INTEGER,
+            const TEXT,
+            label TEXT,
+            votes INTEGER,
+            PRIMARY KEY (prefix, rank)
+        ) WITHOUT ROWID
+    """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO {index}_completions (key, const, label, votes)
+        SELECT completion_key(label), const, label, votes
+        FROM ({source})
+        WHERE completion_key(label) != ''
+        ORDER BY 1, 2
+    """
+    )
+    depth = 1
+    parents = "SELECT '' AS prefix"
+    while True:
+        cursor.execute(
+            f"""
+            INSERT INTO {index}_completion_tops
+            SELECT prefix, n, const, label, votes
+            FROM (
+                SELECT
+                    SUBSTR(c.key, 1, :depth) AS prefix,
+                    c.const,
+                    c.label,
+                    c.votes,
+                    ROW_NUMBER() OVER prefixes AS n,
+                    COUNT(*) OVER (PARTITION BY SUBSTR(c.key, 1, :depth)) AS size
+                FROM ({parents}) parents
+                JOIN {index}_completions c
+                    ON c.key >= parents.prefix AND c.key < parents.prefix || :end
+                WHERE LENGTH(c.key) >= :depth
+                WINDOW prefixes AS (
+                    PARTITION BY SUBSTR(c.key, 1, :depth)
+                    ORDER BY c.votes DESC, c.key, c.const
+                )
+            )
+            WHERE size > :hot AND n <= :top
+        """,
+            dict(depth=depth, end=PREFIX_END, hot=HOT_RANGE, top=TOP_COMPLETIONS),
+        )
+        if not cursor.rowcount:
+            break
+        parents = (
+            f"SELECT DISTINCT prefix FROM {index}_completion_tops"
+            f" WHERE LENGTH(prefix) = {depth}"
+        )
+        depth += 1
+
+
+def build_title_completions(cursor):
+    build_completions(cursor, "title", TITLE_ENTRIES)
+
+
+def build_person_completions(cursor):
+    build_completions(cursor, "person", PERSON_ENTRIES)
+
+
+def complete(index, prefix, limit=TOP_COMPLETIONS, conn=None):
+    """
+    The `limit` most popular entries of `index` whose normalized text starts with the
+    normalized `prefix`, as (const, label, votes).
+    """
+    key = completion_key(prefix)
+    if not key:
+        return []
+    conn = conn or get_read_connection()
+    if limit <= TOP_COMPLETIONS:
+        rows = conn.execute(
+            f"""
+            SELECT const, label, votes FROM {index}_completion_tops
+            WHERE prefix = ? AND rank <= ? ORDER BY rank
+        """,
+            (key, limit),
+        ).fetchall()
+        if rows:
+            return rows
+    return conn.execute(
+        f"""
+        SELECT const, label, votes FROM {index}_completions
+        WHERE key >= ? AND key < ?
+        ORDER BY votes DESC, key, const
+        LIMIT ?
+    """,
+        (key, key + PREFIX_END, limit),
+    ).fetchall()
+
+
+def complete_title(prefix: str, limit: int = TOP_COMPLETIONS):
+    """Titles starting with `prefix`, most voted first."""
+    return complete("title", prefix, limit)
+
+
+def complete_person(prefix: str, limit: int = TOP_COMPLETIONS):
+    """People whose name starts with `prefix`, most voted across their titles first."""
+    return complete("person", prefix, limit)
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from colorama import Fore
+
+from .util import print_color
+
+BATCH_FOLDER = "./processed_data/batch"
+
+# job -> analyze function computing its ranking over (start year, end year)
+JOBS = {
+    "top_countries": "get_movies_with_regional_data",
+    "top_movies": "get_cinematic_rank",
+    "top_directors": "get_directors_rank",
+    "top_producers": "get_producers_rank",
+    "top_actors": "get_actors_rank",
+}
+# rows of the rankings taking a limit, as the separate analyze commands print
+DEFAULT_LIMITS = {
+    "top_movies": 10,
+    "top_directors": None,
+    "top_producers": None,
+    "top_actors": None,
+}
+
+
+def run_job(job, year_start, year_end, folder, limit=None):
+    # imported on use, the CLI imports this module for the names of the jobs
+    from . import analyze
+
+    started = time.time()
+    options = {}
+    if job in DEFAULT_LIMITS:
+        options["limit"] = limit or DEFAULT_LIMITS[job]
+    df = getattr(analyze, JOBS[job])(year_start, year_end, **options)
+    output = os.path.join(folder, f"{job}.csv")
+    df.to_csv(output, index=False)
+    return dict(
+        job=job, rows=len(df), output=output, started=started, finished=time.time()
+    )
+
+
+def run_batch(
+    jobs=None, year_start=1000, year_end=9999, threads=None, folder=None, limit=None
+):
+    """
+    Run the ranking `jobs` (all of them when None) at the same time on `threads`
+    threads, each querying through its own read-only connection. The rankings
+    taking a limit keep `limit` rows, or as many as their analyze command. Every
+    result is
+    written to `<folder>/<job>.csv` and the timings of the jobs, including the error
+    of those that failed, to `<folder>/summary.json`. Returns that summary.
+    """
+    jobs = list(jobs or JOBS)
+    unknown = set(jobs) - set(JOBS)
+    if unknown:
+        raise ValueError(
+            f"Unknown jobs {sorted(unknown)}, expected some of {list(JOBS)}"
+        )
+    folder = folder or BATCH_FOLDER
+    os.makedirs(folder, exist_ok=True)
+    submitted = time.time()
+    summary = []
+    with ThreadPoolExecutor(threads or len(jobs)) as pool:
+        futures = {
+            pool.submit(run_job, job, year_start, year_end, folder, limit): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                entry = future.result()
+            except Exception as error:
+                entry = dict(
+                    job=futures[future],
+                    error=repr(error),
+                    started=submitted,
+                    finished=time.time(),
+                )
+            summary.append(entry)
+    summary.sort(key=lambda entry: jobs.index(entry["job"]))
+    with open(os.path.join(folder, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=1)
+    return summary
+
+
+def print_summary(summary):
+    if not summary:
+        return
+    origin = min(entry["started"] for entry in summary)
+    for entry in summary:
+        timing = (
+            f"{entry['started'] - origin:8.1f}s -> {entry['finished'] - origin:8.1f}s"
+        )
+        if "error" in entry:
+            print_color(
+                f"{entry['job']:<14} failed {timing}  {entry['error']}", Fore.RED
+            )
+        else:
+            print_color(
+                f"{entry['job']:<14} {entry['rows']:>10} rows  {timing}  {entry['output']}",
+                Fore.WHITE,
+            )
+    total = max(entry["finished"] for entry in summary) - origin
+    print_color(f"Batch done in {total:.1f}s", Fore.GREEN)
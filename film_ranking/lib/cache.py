@@ -0,0 +1,178 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from .connections import DATABASE_PATH
+
+CACHE_FOLDER = "./processed_data/cache"
+MAX_CACHE_BYTES = 512 << 20
+MAX_CACHE_ENTRIES = 1000
+
+
+def cache_enabled():
+    return os.environ.get("FILM_RANKING_CACHE", "1") != "0"
+
+
+def database_fingerprint(db_path=DATABASE_PATH):
+    """Changes whenever anything is written to the database, e.g. by load_data."""
+    stat = os.stat(db_path)
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def cache_key(func, args, kwargs, fingerprint):
+    arguments = inspect.signature(func).bind(*args, **kwargs)
+    arguments.apply_defaults()
+    payload = json.dumps(
+        [func.__module__, func.__qualname__, arguments.arguments, fingerprint],
+        sort_keys=True,
+        default=list,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def encode_frame(df):
+    """
+    Columns of `df` as flat arrays: numeric columns as they are, text columns as the
+    concatenated UTF-8 bytes, their end offsets and a null mask. Raises TypeError for
+    any other kind of column.
+    """
+    arrays = {}
+    strings = []
+    for i, (_, values) in enumerate(df.items()):
+        if values.dtype != object:
+            if values.dtype.kind not in "biuf":
+                raise TypeError(f"Cannot cache {values.dtype} columns")
+            arrays[f"c{i}"] = values.to_numpy()
+            continue
+        items = values.tolist()
+        if not all(item is None or isinstance(item, str) for item in items):
+            raise TypeError("Cannot cache object columns holding non text values")
+        encoded = [b"" if item is None else item.encode() for item in items]
+        arrays[f"c{i}.bytes"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        arrays[f"c{i}.ends"] = np.cumsum(
+            [len(item) for item in encoded], dtype=np.int64
+        )
+        arrays[f"c{i}.nulls"] = np.array([item is None for item in items], dtype=bool)
+        strings.append(i)
+    meta = dict(columns=list(df.columns), strings=strings, attrs=df.attrs)
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+    return arrays
+
+
+def decode_frame(arrays):
+    meta = json.loads(arrays["meta"].tobytes())
+    columns = {}
+    for i in range(len(meta["columns"])):
+        if i not in meta["strings"]:
+            columns[i] = arrays[f"c{i}"]
+            continue
+        data = arrays[f"c{i}.bytes"].tobytes()
+        ends = arrays[f"c{i}.ends"].tolist()
+        starts = [0] + ends[:-1]
+        columns[i] = np.array(
+            [
+                None if null else data[start:end].decode()
+                for start, end, null in zip(starts, ends, arrays[f"c{i}.nulls"])
+            ],
+            dtype=object,
+        )
+    df = pd.DataFrame(columns)
+    df.columns = meta["columns"]
+    # json turned tuples into lists
+    df.attrs = {
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in meta["attrs"].items()
+    }
+    return df
+
+
+def read_frame(path):
+    with np.load(path, allow_pickle=False) as arrays:
+        return decode_frame(arrays)
+
+
+def write_frame(path, df):
+    arrays = encode_frame(df)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temp_path, path)
+
+
+def evict(folder=CACHE_FOLDER):
+    """Drop the least recently used results until the cache fits its limits."""
+    entries = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    while entries and (total > MAX_CACHE_BYTES or len(entries) > MAX_CACHE_ENTRIES):
+        _, size, path = entries.pop(0)
+        total -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def touch(path):
+    """Mark a result as used, the mtime orders entries for eviction."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def clear_cache(folder=CACHE_FOLDER):
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+def cached(func):
+    """
+    Keep the DataFrames returned by `func` on disk, keyed on its arguments and the
+    state of the database, so repeating a call does not run its query again. Set
+    FILM_RANKING_CACHE=0 to bypass it.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not cache_enabled():
+            return func(*args, **kwargs)
+        try:
+            fingerprint = database_fingerprint()
+        except FileNotFoundError:
+            return func(*args, **kwargs)
+        key = cache_key(func, args, kwargs, fingerprint)
+        path = os.path.join(CACHE_FOLDER, f"{key}.npz")
+        try:
+            df = read_frame(path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # unreadable entry, it is written again below
+            pass
+        else:
+            touch(path)
+            return df
+        df = func(*args, **kwargs)
+        try:
+            write_frame(path, df)
+        except TypeError:
+            return df
+        evict()
+        return df
+
+    wrapper.uncached = func
+    return wrapper
@@ -0,0 +1,126 @@
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+DATABASE_PATH = "./processed_data/film.db"
+# upper bound of the mapped part of the database, pages are mapped lazily
+MMAP_SIZE = 1 << 30
+# in KiB when negative
+CACHE_SIZE = -64 * 1024
+
+_local = threading.local()
+_lock = threading.Lock()
+# every pooled connection, so they can be closed from any thread
+_connections = set()
+
+
+def load_marker(db_path):
+    return f"{db_path}.loading"
+
+
+@contextmanager
+def loading(db_path=DATABASE_PATH):
+    """
+    Mark a load of `db_path` as running. Meanwhile readers open it without the
+    immutable flag, and the pooled connections are dropped before and after.
+    """
+    close_connections()
+    marker = load_marker(db_path)
+    os.makedirs(os.path.dirname(marker) or ".", exist_ok=True)
+    open(marker, "w").close()
+    try:
+        yield
+    finally:
+        if os.path.exists(marker):
+            os.remove(marker)
+        close_connections()
+
+
+def file_stamp(db_path):
+    stat = os.stat(db_path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def is_immutable(db_path):
+    """Whether `db_path` can be opened immutable, i.e. no load of it is running."""
+    return not os.path.exists(load_marker(db_path))
+
+
+def open_read_only(db_path, immutable=None):
+    """
+    Open `db_path` read-only, tuned for analysis queries. Unless a load is running the
+    database is opened immutable, so SQLite skips locking and change detection.
+    """
+    uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+    if is_immutable(db_path) if immutable is None else immutable:
+        uri += "&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = {CACHE_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def get_read_connection(db_path=DATABASE_PATH):
+    """
+    Read-only connection to `db_path` owned by the calling thread, kept open across
+    calls so its page cache and prepared statements are reused. It is reopened when
+    the database file changed (e.g. it was reloaded by another process), or when an
+    immutable connection is checked out while another process started a load.
+    """
+    db_path = os.path.abspath(db_path)
+    if not hasattr(_local, "pool"):
+        _local.pool = {}
+    stamp = file_stamp(db_path)
+    immutable = is_immutable(db_path)
+    cached = _local.pool.get(db_path)
+    if cached:
+        conn, opened_stamp, opened_immutable = cached
+        if (
+            conn in _connections
+            and opened_stamp == stamp
+            and (immutable or not opened_immutable)
+        ):
+            return conn
+        discard(conn)
+    conn = open_read_only(db_path, immutable)
+    with _lock:
+        _connections.add(conn)
+    _local.pool[db_path] = (conn, stamp, immutable)
+    return conn
+
+
+def discard(conn):
+    with _lock:
+        _connections.discard(conn)
+    conn.close()
+
+
+def close_connections():
+    """
+    Close the pooled connections of every thread, they are opened again on next use.
+    Notebooks and services call it when they are done with the database.
+    """
+    with _lock:
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        conn.close()
+
+
+def forget_connections():
+    """
+    A forked process must not use the connections of its parent: it forgets them and
+    opens its own on first use.
+    """
+    global _local, _lock, _connections
+    _local = threading.local()
+    _lock = threading.Lock()
+    _connections = set()
+
+
+atexit.register(close_connections)
+os.register_at_fork(after_in_child=forget_connections)
@@ -0,0 +1,375 @@
+from colorama import Fore
+
+from .autocomplete import build_person_completions, build_title_completions
+from .fuzzy import build_trigram_index
+from .load_data import create_indexes
+from .util import print_color
+
+
+def build_title_origin(cursor):
+    """
+    Origin region of every title: the region of its last non-original aka carrying
+    the primary title, along with the basics columns rankings filter on.
+    """
+    cursor.execute("DROP TABLE IF EXISTS title_origin")
+    cursor.execute(
+        """
+        CREATE TABLE title_origin (
+            tconst TEXT PRIMARY KEY,
+            titleType TEXT,
+            primaryTitle TEXT,
+            startYear INTEGER,
+            genres TEXT,
+            region TEXT
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO title_origin
+        SELECT titleId, titleType, primaryTitle, startYear, genres, region
+        FROM (
+            SELECT
+                a.titleId,
+                b.titleType,
+                b.primaryTitle,
+                b.startYear,
+                b.genres,
+                a.region,
+                ROW_NUMBER() OVER (PARTITION BY a.titleId ORDER BY a.ordering DESC) AS rank
+            FROM
+                akas a
+            JOIN
+                basics b ON a.titleId = b.tconst
+            WHERE
+                LOWER(a.title) = LOWER(b.primaryTitle)
+                AND a.isOriginalTitle = 0
+                AND a.region != ''
+                AND LENGTH(a.region) < 3
+        )
+        WHERE rank = 1
+    """
+    )
+    create_indexes(cursor, "title_origin")
+
+
+def build_award_stats(cursor):
+    """
+    Award statistics of every title or person (`const`) that was ever nominated.
+    WITHOUT ROWID keeps the rows clustered on const, joining it is a point lookup.
+    """
+    cursor.execute("DROP TABLE IF EXISTS award_stats")
+    cursor.execute(
+        """
+        CREATE TABLE award_stats (
+            const TEXT PRIMARY KEY,
+            awards TEXT,
+            awardsCount INTEGER,
+            wins INTEGER,
+            firstYear INTEGER,
+            lastYear INTEGER
+        ) WITHOUT ROWID
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO award_stats
+        SELECT
+            const,
+            GROUP_CONCAT(awardName || ' ' || categoryName || ' ' || year, ', '),
+            COUNT(*),
+            SUM(isWinner),
+            MIN(year),
+            MAX(year)
+        FROM
+            awards
+        WHERE
+            const IS NOT NULL
+        GROUP BY
+            const
+    """
+    )
+
+
+def build_title_facts(cursor):
+    """
+    One row per rankable title (with an origin region and a rating) holding everything
+    the movie rankings filter and sort on, so they read a single table.
+    """
+    cursor.execute("DROP TABLE IF EXISTS title_facts")
+    cursor.execute(
+        """
+        CREATE TABLE title_facts (
+            tconst TEXT PRIMARY KEY,
+            titleType TEXT,
+            primaryTitle TEXT,
+            startYear INTEGER,
+            genres TEXT,
+            region TEXT,
+            averageRating REAL,
+            numVotes INTEGER,
+            product REAL,
+            awardsCount INTEGER,
+            wins INTEGER
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO title_facts
+        SELECT
+            o.tconst,
+            o.titleType,
+            o.primaryTitle,
+            o.startYear,
+            o.genres,
+            o.region,
+            r.averageRating,
+            r.numVotes,
+            r.averageRating * r.numVotes,
+            COALESCE(a.awardsCount, 0),
+            COALESCE(a.wins, 0)
+        FROM
+            title_origin o
+        JOIN
+            ratings r ON o.tconst = r.tconst
+        LEFT JOIN
+            award_stats a ON o.tconst = a.const
+    """
+    )
+    create_indexes(cursor, "title_facts")
+    # statistics let the planner pick the index matching the filters of each query
+    cursor.execute("ANALYZE title_facts")
+
+
+def build_person_year_stats(cursor):
+    """
+    Per (role, person, year) aggregates of the rankable titles of directors, producers
+    and actors (actresses included). Rankings over any year range sum these buckets
+    instead of going through principals.
+    """
+    cursor.execute("DROP TABLE IF EXISTS person_year_stats")
+    cursor.execute(
+        """
+        CREATE TABLE person_year_stats (
+            role TEXT,
+            nconst TEXT,
+            startYear INTEGER,
+            movieCount INTEGER,
+            totalVotes INTEGER,
+            sumRatings REAL,
+            moviesWithAwards INTEGER,
+            movies TEXT
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO person_year_stats
+        SELECT
+            CASE WHEN p.category = 'actress' THEN 'actor' ELSE p.category END AS role,
+            p.nconst,
+            f.startYear,
+            COUNT(*),
+            SUM(f.numVotes),
+            SUM(f.averageRating),
+            SUM(f.awardsCount > 0),
+            CASE
+                WHEN p.category IN ('actor', 'actress')
+                THEN GROUP_CONCAT(DISTINCT f.primaryTitle)
+                ELSE GROUP_CONCAT(f.primaryTitle)
+            END
+        FROM
+            principals p
+        JOIN
+            title_facts f ON p.tconst = f.tconst
+        WHERE
+            p.category IN ('director', 'producer', 'actor', 'actress')
+        GROUP BY
+            role, p.nconst, f.startYear
+    """
+    )
+    create_indexes(cursor, "person_year_stats")
+
+
+def build_actor_year_regions(cursor):
+    """Distinct origin regions of the titles of every actor per year."""
+    cursor.execute("DROP TABLE IF EXISTS actor_year_regions")
+    cursor.execute(
+        """
+        CREATE TABLE actor_year_regions (
+            nconst TEXT,
+            startYear INTEGER,
+            region TEXT
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO actor_year_regions
+        SELECT DISTINCT
+            p.nconst,
+            f.startYear,
+            f.region
+        FROM
+            principals p
+        JOIN
+            title_facts f ON p.tconst = f.tconst
+        WHERE
+            p.category IN ('actor', 'actress')
+    """
+    )
+    create_indexes(cursor, "actor_year_regions")
+
+
+def build_country_year_stats(cursor):
+    """Per (region, year) aggregates of the rankable titles of every origin region."""
+    cursor.execute("DROP TABLE IF EXISTS country_year_stats")
+    cursor.execute(
+        """
+        CREATE TABLE country_year_stats (
+            region TEXT,
+            startYear INTEGER,
+            numFilms INTEGER,
+            votes INTEGER,
+            sumRatings REAL
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO country_year_stats
+        SELECT
+            region,
+            startYear,
+            COUNT(*),
+            SUM(numVotes),
+            SUM(averageRating)
+        FROM
+            title_facts
+        GROUP BY
+            region, startYear
+    """
+    )
+    create_indexes(cursor, "country_year_stats")
+
+
+def build_title_search(cursor):
+    """
+    Full-text index of the primary, original and aka titles of every title. Diacritics
+    are folded and prefixes of 2 and 3 characters are indexed for prefix queries.
+    """
+    cursor.execute("DROP TABLE IF EXISTS title_search")
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE title_search USING fts5(
+            tconst UNINDEXED,
+            title,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO title_search (tconst, title)
+        SELECT tconst, primaryTitle FROM basics WHERE primaryTitle IS NOT NULL
+        UNION
+        SELECT tconst, originalTitle FROM basics WHERE originalTitle IS NOT NULL
+        UNION
+        SELECT titleId, title FROM akas WHERE title != ''
+    """
+    )
+    cursor.execute("INSERT INTO title_search (title_search) VALUES ('optimize')")
+
+
+def build_name_search(cursor):
+    """Full-text index of the name of every person, see build_title_search."""
+    cursor.execute("DROP TABLE IF EXISTS name_search")
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE name_search USING fts5(
+            nconst UNINDEXED,
+            primaryName,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO name_search (nconst, primaryName)
+        SELECT nconst, primaryName FROM name_basics WHERE primaryName IS NOT NULL
+    """
+    )
+    cursor.execute("INSERT INTO name_search (name_search) VALUES ('optimize')")
+
+
+def build_title_fuzzy(cursor):
+    """Trigram index of the primary title of every title, for typo tolerant lookups."""
+    build_trigram_index(
+        cursor,
+        "title_fuzzy",
+        "SELECT tconst, primaryTitle FROM basics WHERE primaryTitle IS NOT NULL",
+    )
+
+
+def build_name_fuzzy(cursor):
+    """Trigram index of the name of every person, see build_title_fuzzy."""
+    build_trigram_index(
+        cursor,
+        "name_fuzzy",
+        "SELECT nconst, primaryName FROM name_basics WHERE primaryName IS NOT NULL",
+    )
+
+
+# derived table -> (tables it is computed from, builder), in build order
+DERIVED_TABLES = {
+    "title_origin": ({"akas", "basics"}, build_title_origin),
+    "award_stats": ({"awards"}, build_award_stats),
+    "title_facts": (
+        {"title_origin", "ratings", "award_stats"},
+        build_title_facts,
+    ),
+    "person_year_stats": ({"principals", "title_facts"}, build_person_year_stats),
+    "actor_year_regions": ({"principals", "title_facts"}, build_actor_year_regions),
+    "country_year_stats": ({"title_facts"}, build_country_year_stats),
+    "title_search": ({"basics", "akas"}, build_title_search),
+    "name_search": ({"name_basics"}, build_name_search),
+    "title_fuzzy_trigrams": ({"basics"}, build_title_fuzzy),
+    "name_fuzzy_trigrams": ({"name_basics"}, build_name_fuzzy),
+    "title_completions": ({"basics", "ratings"}, build_title_completions),
+    "person_completions": (
+        {"name_basics", "principals", "ratings"},
+        build_person_completions,
+    ),
+}
+
+
+def refresh_derived_tables(conn, changed_tables=None):
+    """
+    Rebuild the derived tables computed from any of `changed_tables` (all of them when
+    None). A rebuilt table counts as changed for the derived tables built after it.
+    Each table is swapped in a single transaction, readers never see it half built.
+    """
+    changed = None if changed_tables is None else set(changed_tables)
+    cursor = conn.cursor()
+    existing = {
+        name
+        for (name,) in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+    for table, (sources, build) in DERIVED_TABLES.items():
+        if changed is not None and not sources & changed:
+            continue
+        if not sources <= existing:
+            print_color(f"Skipping {table}, missing {sources - existing}", Fore.YELLOW)
+            continue
+        print_color(f"Building {table}...", Fore.WHITE)
+        cursor.execute("BEGIN")
+        build(cursor)
+        conn.commit()
+        existing.add(table)
+        if changed is not None:
+            changed.add(table)
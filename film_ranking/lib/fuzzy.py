@@ -0,0 +1,149 @@
+"""
+Trigram index for typo tolerant lookups. Every indexed text gets a dense integer id in
+`<index>_entries`. `<index>_trigrams` maps each trigram to the sorted ids of the texts
+holding it, packed as little endian uint32 in one blob per trigram and load chunk.
+"""
+
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+CHUNK_SIZE = 1_000_000
+POSTING = np.dtype("<u4")
+# Jaccard similarity of the trigram sets below which candidates are dropped
+MIN_SIMILARITY = 0.3
+# candidates whose exact similarity is computed at once
+CANDIDATE_BATCH = 1000
+
+
+def words(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"\w+", text)
+
+
+def trigrams(text):
+    """Trigrams of every word of `text`, padded like pg_trgm: two spaces before, one after."""
+    grams = set()
+    for word in words(text or ""):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def build_trigram_index(cursor, index, source):
+    """
+    Build `<index>_entries` and `<index>_trigrams` from the (const, text) rows of the
+    `source` query, one chunk of CHUNK_SIZE rows at a time to bound memory.
+    """
+    cursor.execute(f"DROP TABLE IF EXISTS {index}_entries")
+    cursor.execute(f"DROP TABLE IF EXISTS {index}_trigrams")
+    cursor.execute(
+        f"""
+        CREATE TABLE {index}_entries (
+            id INTEGER PRIMARY KEY,
+            const TEXT,
+            text TEXT,
+            trigrams INTEGER
+        )
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TABLE {index}_trigrams (
+            trigram TEXT,
+            chunk INTEGER,
+            postings BLOB,
+            PRIMARY KEY (trigram, chunk)
+        ) WITHOUT ROWID
+    """
+    )
+    rows = cursor.connection.execute(source)
+    next_id = 0
+    chunk = 0
+    while batch := rows.fetchmany(CHUNK_SIZE):
+        postings = defaultdict(list)
+        entries = []
+        for const, text in batch:
+            grams = trigrams(text)
+            entries.append((next_id, const, text, len(grams)))
+            for gram in grams:
+                postings[gram].append(next_id)
+            next_id += 1
+        cursor.executemany(f"INSERT INTO {index}_entries VALUES (?, ?, ?, ?)", entries)
+        cursor.executemany(
+            f"INSERT INTO {index}_trigrams VALUES (?, ?, ?)",
+            (
+                (gram, chunk, np.array(ids, dtype=POSTING).tobytes())
+                for gram, ids in postings.items()
+            ),
+        )
+        chunk += 1
+
+
+def read_postings(conn, index, grams):
+    """Sorted ids holding each of `grams`, empty for trigrams that are not indexed."""
+    placeholders = ", ".join("?" * len(grams))
+    chunks = defaultdict(list)
+    for gram, blob in conn.execute(
+        f"SELECT trigram, postings FROM {index}_trigrams"
+        f" WHERE trigram IN ({placeholders}) ORDER BY trigram, chunk",
+        grams,
+    ):
+        chunks[gram].append(np.frombuffer(blob, dtype=POSTING))
+    empty = np.empty(0, dtype=POSTING)
+    return [np.concatenate(chunks[gram]) if gram in chunks else empty for gram in grams]
+
+
+def contains(postings, ids):
+    positions = np.searchsorted(postings, ids)
+    found = positions < len(postings)
+    found[found] = postings[positions[found]] == ids[found]
+    return found
+
+
+def lookup(conn, index, text, limit=10, min_similarity=MIN_SIMILARITY):
+    """
+    The `limit` entries of `index` most similar to `text`, as (const, text, similarity)
+    best first. Similarity is the Jaccard index of the trigram sets.
+
+    An entry reaching `min_similarity` shares at least `required` of the q trigrams
+    of `text`, so it is in at least one of any q - required + 1 postings lists:
+    candidates only come from the shortest ones, the others are only probed.
+    """
+    grams = sorted(trigrams(text))
+    if not grams:
+        return []
+    required = max(1, math.ceil(len(grams) * min_similarity))
+    lists = sorted(read_postings(conn, index, grams), key=len)
+    candidates = np.unique(np.concatenate(lists[: len(grams) - required + 1]))
+    shared = np.zeros(len(candidates), dtype=np.int64)
+    for postings in lists:
+        shared += contains(postings, candidates)
+    keep = shared >= required
+    candidates, shared = candidates[keep], shared[keep]
+    # similarity is at most shared / q, so candidates are scored by decreasing shared
+    # trigrams until no remaining one can beat the results
+    order = np.argsort(-shared, kind="stable")
+    best = []
+    for start in range(0, len(order), CANDIDATE_BATCH):
+        batch = order[start : start + CANDIDATE_BATCH]
+        if len(best) >= limit and best[limit - 1][2] >= shared[batch[0]] / len(grams):
+            break
+        shared_of = dict(zip(candidates[batch].tolist(), shared[batch].tolist()))
+        placeholders = ", ".join("?" * len(shared_of))
+        for id_, const, entry_text, count in conn.execute(
+            f"SELECT id, const, text, trigrams FROM {index}_entries"
+            f" WHERE id IN ({placeholders})",
+            list(shared_of),
+        ):
+            common = shared_of[id_]
+            similarity = common / (len(grams) + count - common)
+            if similarity >= min_similarity:
+                best.append((const, entry_text, similarity))
+        best.sort(key=lambda entry: -entry[2])
+        del best[limit:]
+    return best
@@ -1,23 +1,361 @@
 import csv
 import os
+import re
 import sqlite3
 import sys
 import pandas as pd
 
 from .movies_origin import get_country_of_origin
+from .parallel_load import parallel_chunk_reader
 
 DATABASE_NAME = "film.db"
+# rows sent to sqlite per executemany call
+BATCH_SIZE = 50_000
+# compressed dumps are decompressed on the fly by pandas, in this order of preference
+COMPRESSED_SUFFIXES = (".gz", ".zst", ".xz", ".bz2")
+# IMDb dumps mark missing values with \N and never quote their fields
+IMDB_READ_OPTIONS = dict(
+    na_values=["\\N"], keep_default_na=False, quoting=csv.QUOTE_NONE
+)
+BOOLEAN_VALUES = {"1": True, "0": False, "True": True, "False": False}
 csv.field_size_limit(sys.maxsize)
 
 
+def find_data_file(folder, file_name):
+    """
+    Path of `file_name` in `folder`, or of its compressed version (e.g.
+    title.akas.tsv.gz) when only that one exists.
+    """
+    for suffix in ("",) + COMPRESSED_SUFFIXES:
+        file_path = os.path.join(folder, file_name + suffix)
+        if os.path.exists(file_path):
+            return file_path
+    return os.path.join(folder, file_name)
+
+
+def is_compressed(file_path):
+    return str(file_path).endswith(COMPRESSED_SUFFIXES)
+
+
+def convert_types(chunk, column_types):
+    """
+    Convert the text columns of a chunk in place to the nullable pandas types in
+    `column_types` ({column: "Int64" | "Float64" | "boolean"}). Values that don't
+    parse become NULL, decimal commas (countries.tsv) are accepted.
+    """
+    for column, kind in column_types.items():
+        values = chunk[column].astype("string")
+        if kind == "boolean":
+            chunk[column] = values.map(BOOLEAN_VALUES).astype("boolean")
+        else:
+            values = values.str.replace(",", ".", regex=False)
+            chunk[column] = pd.to_numeric(values, errors="coerce").astype(kind)
+    return chunk
+
+
+def canonical_text(chunk):
+    """
+    The values of `chunk` as text, the same whatever dtypes pandas inferred for this
+    chunk: a column of whole numbers holding a NULL is read as float, or as object
+    when it is all NULL, so whole floats are written without their ".0".
+    """
+    text = chunk.astype("string")
+    for column in chunk.select_dtypes("float").columns:
+        values = chunk[column].astype("Float64")
+        whole = ((values % 1 == 0) & (values.abs() < 2**53)).fillna(False)
+        text.loc[whole, column] = values[whole].astype("Int64").astype("string")
+    return text
+
+
+def lazy_pandas_chunk_reader(
+    file_path,
+    chunksize=1000,
+    delimiter="\t",
+    digests=False,
+    column_types=None,
+    key_columns=(),
+    **read_options,
+):
+    """
+    Yield the rows of every chunk as a list of tuples, with missing values as None.
+    Columns listed in `column_types` are converted per chunk, the others are kept as
+    text; without `column_types` pandas infers the types. Missing values of the
+    `key_columns` are read as '' instead, NULLs never conflict in a primary key. With
+    `digests` every chunk comes with a list holding a 64 bit hash of the text of each
+    row, used to detect changed rows.
+    """
+    for chunk in pd.read_csv(
+        file_path,
+        chunksize=chunksize,
+        delimiter=delimiter,
+        dtype=str if column_types else None,
+        **read_options,
+    ):
+        if column_types:
+            convert_types(chunk, column_types)
+        for column in key_columns:
+            chunk[column] = chunk[column].fillna("")
+        values = chunk.astype(object).where(chunk.notna(), None)
+        rows = list(values.itertuples(index=False, name=None))
+        if digests:
+            hashes = pd.util.hash_pandas_object(canonical_text(chunk), index=False)
+            yield rows, hashes.to_numpy().view("int64").tolist()
+        else:
+            yield rows
+
+
 def lazy_pandas_csv_reader(file_path, chunksize=1000, delimiter="\t"):
-    for chunk in pd.read_csv(file_path, chunksize=chunksize, delimiter=delimiter):
-        for row in chunk.itertuples(index=False, name=None):
-            yield row
+    for rows in lazy_pandas_chunk_reader(file_path, chunksize, delimiter):
+        yield from rows
+
+
+def bulk_ingest(
+    conn,
+    cursor,
+    query,
+    file_path,
+    delimiter="\t",
+    batch_size=BATCH_SIZE,
+    commit_every=None,
+    workers=1,
+    incremental=False,
+    **read_options,
+):
+    """
+    Send every pandas chunk of the file to sqlite as a single executemany batch.
+    Each chunk runs inside an explicit transaction which is committed once at least
+    `commit_every` rows (default: one batch) are pending. With `workers` > 1 the file
+    is parsed by that many processes while this one only writes (compressed files
+    can't be split and are always parsed here, as a stream). With `incremental`
+    only the rows that differ from the previous load are written, see `write_delta`.
+    `read_options` go to `lazy_pandas_chunk_reader`. Returns the number of rows read.
+    """
+    reader_options = dict(
+        chunksize=batch_size, delimiter=delimiter, digests=incremental, **read_options
+    )
+    if workers > 1 and not is_compressed(file_path):
+        batches = parallel_chunk_reader(
+            file_path, lazy_pandas_chunk_reader, workers, **reader_options
+        )
+    else:
+        batches = lazy_pandas_chunk_reader(file_path, **reader_options)
+
+    commit_every = commit_every or batch_size
+    if incremental:
+        return write_delta(conn, cursor, query, batches, commit_every)
+    return write_batches(conn, cursor, query, batches, commit_every)
+
+
+def write_batches(conn, cursor, query, batches, commit_every):
+    total = 0
+    pending = 0
+    for rows in batches:
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        cursor.executemany(query, rows)
+        total += len(rows)
+        pending += len(rows)
+        if pending >= commit_every:
+            conn.commit()
+            pending = 0
+    conn.commit()
+    return total
+
+
+def insert_target(query):
+    """Table and column names an INSERT query writes to."""
+    table, columns = re.search(r"INTO (\w+) \(([^)]*)\)", query).groups()
+    return table, [column.strip() for column in columns.split(",")]
+
+
+def drop_digests(cursor, table):
+    """
+    Forget the row digests of `table` when it is written by a full load, so the next
+    incremental load compares every row again instead of trusting stale digests.
+    """
+    cursor.execute(f"DROP TABLE IF EXISTS {table}_digests")
+
+
+def write_delta(conn, cursor, query, batches, commit_every):
+    """
+    Apply a fresh copy of a source file as a row level delta. A digest of every row
+    is kept per primary key in `<table>_digests`; rows whose digest did not change
+    are skipped, rows missing from the file are deleted. Missing key values are
+    written as ''. Tables without a natural key in the file (awards) are emptied and
+    written again.
+    """
+    table, columns = insert_target(query)
+    info = cursor.execute(f"PRAGMA table_info({table})").fetchall()
+    key = [name for _, name, _, _, _, pk in sorted(info, key=lambda c: c[5]) if pk]
+    if not set(key) <= set(columns):
+        cursor.execute(f"DELETE FROM {table}")
+        batches = (rows for rows, _ in batches)
+        return write_batches(conn, cursor, query, batches, commit_every)
+
+    positions = [columns.index(name) for name in key]
+
+    def key_filled(row):
+        # NULLs never match in the key comparisons below, they are stored as ''
+        if all(row[p] is not None for p in positions):
+            return row
+        row = list(row)
+        for p in positions:
+            if row[p] is None:
+                row[p] = ""
+        return tuple(row)
+
+    keys = ", ".join(key)
+    placeholders = ", ".join("?" for _ in key)
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table}_digests (
+            {keys},
+            digest INTEGER,
+            PRIMARY KEY ({keys})
+        ) WITHOUT ROWID
+    """
+    )
+    cursor.execute("DROP TABLE IF EXISTS temp.delta_seen")
+    cursor.execute("DROP TABLE IF EXISTS temp.delta_chunk")
+    cursor.execute(
+        f"CREATE TEMP TABLE delta_seen ({keys}, PRIMARY KEY ({keys})) WITHOUT ROWID"
+    )
+    cursor.execute(f"CREATE TEMP TABLE delta_chunk (position INTEGER, {keys}, digest)")
+
+    total = 0
+    pending = 0
+    for rows, digests in batches:
+        rows = [key_filled(row) for row in rows]
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        cursor.executemany(
+            f"INSERT INTO delta_chunk VALUES (?, {placeholders}, ?)",
+            (
+                (position, *[row[p] for p in positions], digest)
+                for position, (row, digest) in enumerate(zip(rows, digests))
+            ),
+        )
+        changed = cursor.execute(
+            f"""
+            SELECT c.position
+            FROM delta_chunk c
+            LEFT JOIN {table}_digests d USING ({keys})
+            WHERE d.digest IS NOT c.digest
+        """
+        ).fetchall()
+        cursor.executemany(query, [rows[position] for (position,) in changed])
+        cursor.execute(
+            f"""
+            INSERT INTO {table}_digests ({keys}, digest)
+            SELECT {keys}, digest FROM delta_chunk WHERE true
+            ON CONFLICT ({keys}) DO UPDATE SET digest = excluded.digest
+            WHERE digest IS NOT excluded.digest
+        """
+        )
+        cursor.execute(
+            f"INSERT OR IGNORE INTO delta_seen SELECT {keys} FROM delta_chunk"
+        )
+        cursor.execute("DELETE FROM delta_chunk")
+        total += len(rows)
+        pending += len(changed)
+        if pending >= commit_every:
+            conn.commit()
+            pending = 0
+
+    # against the table itself, it may hold rows of a full load without a digest
+    seen = f"SELECT {keys} FROM delta_seen"
+    cursor.execute(f"DELETE FROM {table} WHERE ({keys}) NOT IN ({seen})")
+    cursor.execute(f"DELETE FROM {table}_digests WHERE ({keys}) NOT IN ({seen})")
+    conn.commit()
+    cursor.execute("DROP TABLE temp.delta_seen")
+    cursor.execute("DROP TABLE temp.delta_chunk")
+    return total
+
+
+# Secondary indexes of every table: {table: {index name: indexed columns}}
+INDEXES = {
+    "akas": {"idx_akas_title": "title"},
+    "basics": {
+        "idx_startYear": "startYear",
+        "idx_genres": "genres",
+        "idx_titleType": "titleType",
+        "idx_primaryTitle": "primaryTitle",
+    },
+    "principals": {"idx_principals_category": "category"},
+    "ratings": {
+        "idx_ratings_numVotes": "numVotes",
+        "idx_ratings_averageRating": "averageRating",
+    },
+    "name_basics": {"idx_nameBasics_primaryName": "primaryName"},
+    "awards": {
+        "idx_awards_awardName": "awardName",
+        "idx_awards_year": "year",
+        "idx_awards_categoryName": "categoryName",
+        "idx_awards_const": "const",
+    },
+    "title_origin": {
+        "idx_titleOrigin_region": "region",
+        "idx_titleOrigin_startYear": "startYear",
+    },
+    "title_facts": {
+        "idx_titleFacts_year_type": "startYear, titleType, product",
+        "idx_titleFacts_year_region": "startYear, region, product",
+        "idx_titleFacts_year_product": "startYear, product",
+    },
+    "person_year_stats": {
+        "idx_personYearStats_year": "role, startYear, nconst",
+        "idx_personYearStats_nconst": "nconst, role, startYear",
+    },
+    "actor_year_regions": {
+        "idx_actorYearRegions_year": "startYear, nconst, region",
+        "idx_actorYearRegions_nconst": "nconst",
+    },
+    "country_year_stats": {"idx_countryYearStats_year": "startYear, region"},
+}
+
+
+def create_indexes(cursor, table):
+    for index, columns in INDEXES.get(table, {}).items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns})")
+
+
+def drop_indexes(cursor, table):
+    for index in INDEXES.get(table, {}):
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def load_table(
+    table,
+    create_table,
+    ingest,
+    file_path,
+    db_path=None,
+    defer_indexes=False,
+    **options,
+):
+    """
+    Create `table` and stream `file_path` into it. With `defer_indexes` the secondary
+    indexes are dropped before the load and rebuilt once all rows are in, so the inserts
+    only have to maintain the primary key.
+    """
+    conn = get_connection(db_path)
+    cursor = conn.cursor()
+    create_table(cursor, with_indexes=not defer_indexes)
+    if defer_indexes:
+        drop_indexes(cursor, table)
+    if not options.get("incremental"):
+        drop_digests(cursor, table)
+    conn.commit()
+    rows = ingest(conn, cursor, file_path, **options)
+    if defer_indexes:
+        create_indexes(cursor, table)
+        conn.commit()
+    conn.close()
+    return rows
 
 
 # for title.akas
-def create_table_movies_akas(cursor):
+def create_table_movies_akas(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -34,44 +372,49 @@ def create_table_movies_akas(cursor):
         )
     """
     )
-    cursor.execute("CREATE INDEX idx_akas_title ON akas (title)")
-
-
-def ingest_movies_akas(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO akas (titleId, ordering, title, region, language, types, attributes, isOriginalTitle)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(titleId, title, region) DO UPDATE SET
-                ordering=excluded.ordering,
-                title=excluded.title,
-                region=excluded.region,
-                language=excluded.language,
-                types=excluded.types,
-                attributes=excluded.attributes,
-                isOriginalTitle=excluded.isOriginalTitle
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
-
+    if with_indexes:
+        create_indexes(cursor, "akas")
+
+
+AKAS_TYPES = {"ordering": "Int64", "isOriginalTitle": "boolean"}
+# many akas have no region
+AKAS_KEY = ("titleId", "title", "region")
+
+AKAS_UPSERT_QUERY = """
+    INSERT INTO akas (titleId, ordering, title, region, language, types, attributes, isOriginalTitle)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(titleId, title, region) DO UPDATE SET
+        ordering=excluded.ordering,
+        title=excluded.title,
+        region=excluded.region,
+        language=excluded.language,
+        types=excluded.types,
+        attributes=excluded.attributes,
+        isOriginalTitle=excluded.isOriginalTitle
+"""
+
+
+def ingest_movies_akas(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn,
+        cursor,
+        AKAS_UPSERT_QUERY,
+        file_path,
+        column_types=AKAS_TYPES,
+        key_columns=AKAS_KEY,
+        **IMDB_READ_OPTIONS,
+        **options,
+    )
 
-def load_movies_akas(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_movies_akas(cursor)
-    conn.commit()
-    ingest_movies_akas(conn, cursor, file_path)
-    # Commit the transaction
 
-    # Close the connection
-    conn.close()
+def load_movies_akas(file_path: str, **options):
+    return load_table(
+        "akas", create_table_movies_akas, ingest_movies_akas, file_path, **options
+    )
 
 
 # for movies.basics
-def create_table_movies_basics(cursor):
+def create_table_movies_basics(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -89,48 +432,52 @@ def create_table_movies_basics(cursor):
         )
     """
     )
-    cursor.execute("CREATE INDEX idx_startYear ON basics (startYear)")
-    cursor.execute("CREATE INDEX idx_genres ON basics (genres)")
-    cursor.execute("CREATE INDEX idx_titleType ON basics (titleType)")
-    cursor.execute("CREATE INDEX idx_primaryTitle ON basics (primaryTitle)")
-
-
-def ingest_movies_basics(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO basics (tconst, titleType, primaryTitle, originalTitle, isAdult, startYear, endYear, runtimeMinutes, genres)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(tconst) DO UPDATE SET
-                titleType=excluded.titleType,
-                primaryTitle=excluded.primaryTitle,
-                originalTitle=excluded.originalTitle,
-                isAdult=excluded.isAdult,
-                startYear=excluded.startYear,
-                endYear=excluded.endYear,
-                runtimeMinutes=excluded.runtimeMinutes,
-                genres=excluded.genres
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
+    if with_indexes:
+        create_indexes(cursor, "basics")
+
+
+BASICS_TYPES = {
+    "isAdult": "boolean",
+    "startYear": "Int64",
+    "endYear": "Int64",
+    "runtimeMinutes": "Int64",
+}
+
+BASICS_UPSERT_QUERY = """
+    INSERT INTO basics (tconst, titleType, primaryTitle, originalTitle, isAdult, startYear, endYear, runtimeMinutes, genres)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(tconst) DO UPDATE SET
+        titleType=excluded.titleType,
+        primaryTitle=excluded.primaryTitle,
+        originalTitle=excluded.originalTitle,
+        isAdult=excluded.isAdult,
+        startYear=excluded.startYear,
+        endYear=excluded.endYear,
+        runtimeMinutes=excluded.runtimeMinutes,
+        genres=excluded.genres
+"""
+
+
+def ingest_movies_basics(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn,
+        cursor,
+        BASICS_UPSERT_QUERY,
+        file_path,
+        column_types=BASICS_TYPES,
+        **IMDB_READ_OPTIONS,
+        **options,
+    )
 
 
-def load_movies_basics(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_movies_basics(cursor)
-    conn.commit()
-    ingest_movies_basics(conn, cursor, file_path)
-    # Commit the transaction
-    conn.commit()
-    # Close the connection
-    conn.close()
+def load_movies_basics(file_path: str, **options):
+    return load_table(
+        "basics", create_table_movies_basics, ingest_movies_basics, file_path, **options
+    )
 
 
 # for countries data
-def create_table_countries(cursor):
+def create_table_countries(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -161,54 +508,74 @@ def create_table_countries(cursor):
     )
 
 
-def ingest_countries_data(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO countries (country, abbreviation, region, population, area_sq_mi, pop_density_per_sq_mi, coastline_ratio, net_migration, infant_mortality_per_1000_births, gdp_capita, literacy, phones_per_1000, arable, crops, other, climate, birthrate, deathrate, agriculture, industry, service)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(country) DO UPDATE SET
-                abbreviation=excluded.abbreviation,
-                region=excluded.region,
-                population=excluded.population,
-                area_sq_mi=excluded.area_sq_mi,
-                pop_density_per_sq_mi=excluded.pop_density_per_sq_mi,
-                coastline_ratio=excluded.coastline_ratio,
-                net_migration=excluded.net_migration,
-                infant_mortality_per_1000_births=excluded.infant_mortality_per_1000_births,
-                gdp_capita=excluded.gdp_capita,
-                literacy=excluded.literacy,
-                phones_per_1000=excluded.phones_per_1000,
-                arable=excluded.arable,
-                crops=excluded.crops,
-                other=excluded.other,
-                climate=excluded.climate,
-                birthrate=excluded.birthrate,
-                deathrate=excluded.deathrate,
-                agriculture=excluded.agriculture,
-                industry=excluded.industry,
-                service=excluded.service
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
+# keyed by the column names of countries.tsv
+COUNTRIES_TYPES = {
+    "population": "Int64",
+    "Area (sq. mi.)": "Float64",
+    "Pop. Density (per sq. mi.)": "Float64",
+    "Coastline (coast/area ratio)": "Float64",
+    "Net migration": "Float64",
+    "Infant mortality (per 1000 births)": "Float64",
+    "gdpCapita": "Float64",
+    "Literacy (%)": "Float64",
+    "Phones (per 1000)": "Float64",
+    "Arable (%)": "Float64",
+    "Crops (%)": "Float64",
+    "Other (%)": "Float64",
+    "Climate": "Float64",
+    "Birthrate": "Float64",
+    "Deathrate": "Float64",
+    "Agriculture": "Float64",
+    "Industry": "Float64",
+    "Service": "Float64",
+}
+
+COUNTRIES_UPSERT_QUERY = """
+    INSERT INTO countries (country, abbreviation, region, population, area_sq_mi, pop_density_per_sq_mi, coastline_ratio, net_migration, infant_mortality_per_1000_births, gdp_capita, literacy, phones_per_1000, arable, crops, other, climate, birthrate, deathrate, agriculture, industry, service)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(country) DO UPDATE SET
+        abbreviation=excluded.abbreviation,
+        region=excluded.region,
+        population=excluded.population,
+        area_sq_mi=excluded.area_sq_mi,
+        pop_density_per_sq_mi=excluded.pop_density_per_sq_mi,
+        coastline_ratio=excluded.coastline_ratio,
+        net_migration=excluded.net_migration,
+        infant_mortality_per_1000_births=excluded.infant_mortality_per_1000_births,
+        gdp_capita=excluded.gdp_capita,
+        literacy=excluded.literacy,
+        phones_per_1000=excluded.phones_per_1000,
+        arable=excluded.arable,
+        crops=excluded.crops,
+        other=excluded.other,
+        climate=excluded.climate,
+        birthrate=excluded.birthrate,
+        deathrate=excluded.deathrate,
+        agriculture=excluded.agriculture,
+        industry=excluded.industry,
+        service=excluded.service
+"""
+
+
+def ingest_countries_data(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn,
+        cursor,
+        COUNTRIES_UPSERT_QUERY,
+        file_path,
+        column_types=COUNTRIES_TYPES,
+        **options,
+    )
 
 
-def load_countries_data(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_countries(cursor)
-    conn.commit()
-    ingest_countries_data(conn, cursor, file_path)
-    # Commit the transaction
-    conn.commit()
-    # Close the connection
-    conn.close()
+def load_countries_data(file_path: str, **options):
+    return load_table(
+        "countries", create_table_countries, ingest_countries_data, file_path, **options
+    )
 
 
 # for crew data
-def create_table_movies_crew(cursor):
+def create_table_movies_crew(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -221,36 +588,29 @@ def create_table_movies_crew(cursor):
     )
 
 
-def ingest_movies_crew(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO crew (tconst, directors, writers)
-            VALUES (?, ?, ?)
-            ON CONFLICT(tconst) DO UPDATE SET
-                directors=excluded.directors,
-                writers=excluded.writers
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
+CREW_UPSERT_QUERY = """
+    INSERT INTO crew (tconst, directors, writers)
+    VALUES (?, ?, ?)
+    ON CONFLICT(tconst) DO UPDATE SET
+        directors=excluded.directors,
+        writers=excluded.writers
+"""
 
 
-def load_movies_crew(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_movies_crew(cursor)
-    conn.commit()
-    ingest_movies_crew(conn, cursor, file_path)
-    # Commit the transaction
-    conn.commit()
-    # Close the connection
-    conn.close()
+def ingest_movies_crew(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn, cursor, CREW_UPSERT_QUERY, file_path, **IMDB_READ_OPTIONS, **options
+    )
+
+
+def load_movies_crew(file_path: str, **options):
+    return load_table(
+        "crew", create_table_movies_crew, ingest_movies_crew, file_path, **options
+    )
 
 
 # for principals
-def create_table_movie_principals(cursor):
+def create_table_movie_principals(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -265,40 +625,46 @@ def create_table_movie_principals(cursor):
         )
     """
     )
-    cursor.execute("CREATE INDEX idx_principals_category ON principals (category)")
-
-
-def ingest_movie_principals(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO principals (tconst, ordering, nconst, category, job, characters)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(tconst, ordering, nconst) DO UPDATE SET
-                category=excluded.category,
-                job=excluded.job,
-                characters=excluded.characters
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
+    if with_indexes:
+        create_indexes(cursor, "principals")
+
+
+PRINCIPALS_TYPES = {"ordering": "Int64"}
+
+PRINCIPALS_UPSERT_QUERY = """
+    INSERT INTO principals (tconst, ordering, nconst, category, job, characters)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(tconst, ordering, nconst) DO UPDATE SET
+        category=excluded.category,
+        job=excluded.job,
+        characters=excluded.characters
+"""
+
+
+def ingest_movie_principals(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn,
+        cursor,
+        PRINCIPALS_UPSERT_QUERY,
+        file_path,
+        column_types=PRINCIPALS_TYPES,
+        **IMDB_READ_OPTIONS,
+        **options,
+    )
 
 
-def load_movie_principals(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_movie_principals(cursor)
-    conn.commit()
-    ingest_movie_principals(conn, cursor, file_path)
-    # Commit the transaction
-    conn.commit()
-    # Close the connection
-    conn.close()
+def load_movie_principals(file_path: str, **options):
+    return load_table(
+        "principals",
+        create_table_movie_principals,
+        ingest_movie_principals,
+        file_path,
+        **options,
+    )
 
 
 # for ratings
-def create_table_movie_ratings(cursor):
+def create_table_movie_ratings(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -309,40 +675,45 @@ def create_table_movie_ratings(cursor):
         )
     """
     )
-    cursor.execute("CREATE INDEX idx_ratings_numVotes ON ratings (numVotes)")
-    cursor.execute("CREATE INDEX idx_ratings_averageRating ON ratings (averageRating)")
-
-
-def ingest_movie_ratings(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO ratings (tconst, averageRating, numVotes)
-            VALUES (?, ?, ?)
-            ON CONFLICT(tconst) DO UPDATE SET
-                averageRating=excluded.averageRating,
-                numVotes=excluded.numVotes
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
+    if with_indexes:
+        create_indexes(cursor, "ratings")
+
+
+RATINGS_TYPES = {"averageRating": "Float64", "numVotes": "Int64"}
+
+RATINGS_UPSERT_QUERY = """
+    INSERT INTO ratings (tconst, averageRating, numVotes)
+    VALUES (?, ?, ?)
+    ON CONFLICT(tconst) DO UPDATE SET
+        averageRating=excluded.averageRating,
+        numVotes=excluded.numVotes
+"""
+
+
+def ingest_movie_ratings(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn,
+        cursor,
+        RATINGS_UPSERT_QUERY,
+        file_path,
+        column_types=RATINGS_TYPES,
+        **IMDB_READ_OPTIONS,
+        **options,
+    )
 
 
-def load_movie_ratings(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_movie_ratings(cursor)
-    conn.commit()
-    ingest_movie_ratings(conn, cursor, file_path)
-    # Commit the transaction
-    conn.commit()
-    # Close the connection
-    conn.close()
+def load_movie_ratings(file_path: str, **options):
+    return load_table(
+        "ratings",
+        create_table_movie_ratings,
+        ingest_movie_ratings,
+        file_path,
+        **options,
+    )
 
 
 # for name basics
-def create_table_name_basics(cursor):
+def create_table_name_basics(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -356,44 +727,48 @@ def create_table_name_basics(cursor):
         )
     """
     )
-    cursor.execute(
-        "CREATE INDEX idx_nameBasics_primaryName ON name_basics (primaryName)"
+    if with_indexes:
+        create_indexes(cursor, "name_basics")
+
+
+NAME_BASICS_TYPES = {"birthYear": "Int64", "deathYear": "Int64"}
+
+NAME_BASICS_UPSERT_QUERY = """
+    INSERT INTO name_basics (nconst, primaryName, birthYear, deathYear, primaryProfession, knownForTitles)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(nconst) DO UPDATE SET
+        primaryName=excluded.primaryName,
+        birthYear=excluded.birthYear,
+        deathYear=excluded.deathYear,
+        primaryProfession=excluded.primaryProfession,
+        knownForTitles=excluded.knownForTitles
+"""
+
+
+def ingest_name_basics(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn,
+        cursor,
+        NAME_BASICS_UPSERT_QUERY,
+        file_path,
+        column_types=NAME_BASICS_TYPES,
+        **IMDB_READ_OPTIONS,
+        **options,
     )
 
 
-def ingest_name_basics(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO name_basics (nconst, primaryName, birthYear, deathYear, primaryProfession, knownForTitles)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(nconst) DO UPDATE SET
-                primaryName=excluded.primaryName,
-                birthYear=excluded.birthYear,
-                deathYear=excluded.deathYear,
-                primaryProfession=excluded.primaryProfession,
-                knownForTitles=excluded.knownForTitles
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
-
-
-def load_name_basics(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_name_basics(cursor)
-    conn.commit()
-    ingest_name_basics(conn, cursor, file_path)
-    # Commit the transaction
-    conn.commit()
-    # Close the connection
-    conn.close()
+def load_name_basics(file_path: str, **options):
+    return load_table(
+        "name_basics",
+        create_table_name_basics,
+        ingest_name_basics,
+        file_path,
+        **options,
+    )
 
 
 # for episodes
-def create_table_episodes(cursor):
+def create_table_episodes(cursor, with_indexes=True):
     # Create the table
     cursor.execute(
         """
@@ -407,37 +782,38 @@ def create_table_episodes(cursor):
     )
 
 
-def ingest_episodes(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path):
-        upsert_query = """
-            INSERT INTO episodes (tconst, parentTconst, seasonNumber, episodeNumber)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(tconst) DO UPDATE SET
-                parentTconst=excluded.parentTconst,
-                seasonNumber=excluded.seasonNumber,
-                episodeNumber=excluded.episodeNumber
-        """
-        cursor.execute(upsert_query, row)
-        # Optionally, commit periodically to avoid holding too many uncommitted rows in memory
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
-            # never call conn.close() from here!
+EPISODES_TYPES = {"seasonNumber": "Int64", "episodeNumber": "Int64"}
 
+EPISODES_UPSERT_QUERY = """
+    INSERT INTO episodes (tconst, parentTconst, seasonNumber, episodeNumber)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(tconst) DO UPDATE SET
+        parentTconst=excluded.parentTconst,
+        seasonNumber=excluded.seasonNumber,
+        episodeNumber=excluded.episodeNumber
+"""
+
+
+def ingest_episodes(conn, cursor, file_path, **options):
+    return bulk_ingest(
+        conn,
+        cursor,
+        EPISODES_UPSERT_QUERY,
+        file_path,
+        column_types=EPISODES_TYPES,
+        **IMDB_READ_OPTIONS,
+        **options,
+    )
 
-def load_episodes(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_episodes(cursor)
-    conn.commit()
-    ingest_episodes(conn, cursor, file_path)
-    # Commit the transaction
-    conn.commit()
-    # Close the connection
-    conn.close()
+
+def load_episodes(file_path: str, **options):
+    return load_table(
+        "episodes", create_table_episodes, ingest_episodes, file_path, **options
+    )
 
 
 # for events
-def create_table_events(cursor):
+def create_table_events(cursor, with_indexes=True):
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS awards (
@@ -466,30 +842,45 @@ def create_table_events(cursor):
         )
     """
     )
-    cursor.execute("CREATE INDEX idx_awards_awardName ON awards (awardName)")
-    cursor.execute("CREATE INDEX idx_awards_year ON awards (year)")
-    cursor.execute("CREATE INDEX idx_awards_categoryName ON awards (categoryName)")
-
-
-def ingest_events_data(conn, cursor, file_path):
-    for row in lazy_pandas_csv_reader(file_path, delimiter=","):
-        insert_query = """
-            INSERT OR IGNORE INTO awards (eventId, eventName, awardName, year, occurrence, winAnnouncementTime, categoryName, nomeneeNote, name, originalName, songNames, episodeNames, characterNames, isWinner, isPrimary, isSecondary, isPerson, isTitle, isCompany, const, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        cursor.execute(insert_query, row)
-        if cursor.lastrowid % 1000 == 0:
-            conn.commit()
+    if with_indexes:
+        create_indexes(cursor, "awards")
+
+
+AWARDS_TYPES = {
+    "year": "Int64",
+    "occurrence": "Int64",
+    "isWinner": "boolean",
+    "isPrimary": "boolean",
+    "isSecondary": "boolean",
+    "isPerson": "boolean",
+    "isTitle": "boolean",
+    "isCompany": "boolean",
+}
+
+AWARDS_INSERT_QUERY = """
+    INSERT OR IGNORE INTO awards (eventId, eventName, awardName, year, occurrence, winAnnouncementTime, categoryName, nomeneeNote, name, originalName, songNames, episodeNames, characterNames, isWinner, isPrimary, isSecondary, isPerson, isTitle, isCompany, const, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def ingest_events_data(conn, cursor, file_path, **options):
+    # quoted csv fields may contain line breaks, so awards.csv can't be split by bytes
+    options.pop("workers", None)
+    return bulk_ingest(
+        conn,
+        cursor,
+        AWARDS_INSERT_QUERY,
+        file_path,
+        delimiter=",",
+        column_types=AWARDS_TYPES,
+        **options,
+    )
 
 
-def load_events_data(file_path: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    create_table_events(cursor)
-    conn.commit()
-    ingest_events_data(conn, cursor, file_path)
-    conn.commit()
-    conn.close()
+def load_events_data(file_path: str, **options):
+    return load_table(
+        "awards", create_table_events, ingest_events_data, file_path, **options
+    )
 
 
 def update_country_of_origin():
@@ -514,15 +905,94 @@ def update_country_of_origin():
                 # never call conn.close() from here!
 
 
-def get_connection():
-    # Define the path to the database directory
-    folder_path = "./processed_data"
+# source file -> (table, create_table, ingest, insert query)
+DATA_FILES = {
+    "title.akas.tsv": (
+        "akas",
+        create_table_movies_akas,
+        ingest_movies_akas,
+        AKAS_UPSERT_QUERY,
+    ),
+    "title.basics.tsv": (
+        "basics",
+        create_table_movies_basics,
+        ingest_movies_basics,
+        BASICS_UPSERT_QUERY,
+    ),
+    "countries.tsv": (
+        "countries",
+        create_table_countries,
+        ingest_countries_data,
+        COUNTRIES_UPSERT_QUERY,
+    ),
+    "title.crew.tsv": (
+        "crew",
+        create_table_movies_crew,
+        ingest_movies_crew,
+        CREW_UPSERT_QUERY,
+    ),
+    "title.principals.tsv": (
+        "principals",
+        create_table_movie_principals,
+        ingest_movie_principals,
+        PRINCIPALS_UPSERT_QUERY,
+    ),
+    "title.ratings.tsv": (
+        "ratings",
+        create_table_movie_ratings,
+        ingest_movie_ratings,
+        RATINGS_UPSERT_QUERY,
+    ),
+    "name.basics.tsv": (
+        "name_basics",
+        create_table_name_basics,
+        ingest_name_basics,
+        NAME_BASICS_UPSERT_QUERY,
+    ),
+    "title.episode.tsv": (
+        "episodes",
+        create_table_episodes,
+        ingest_episodes,
+        EPISODES_UPSERT_QUERY,
+    ),
+    "awards.csv": (
+        "awards",
+        create_table_events,
+        ingest_events_data,
+        AWARDS_INSERT_QUERY,
+    ),
+}
+
+
+def merge_table(cursor, table, query, source):
+    """
+    Copy `table` from the attached database `source` into the main one. An empty
+    table gets a plain copy, otherwise the rows go through the same insert `query`
+    used by the ingest so conflicts resolve exactly as in a direct load.
+    """
+    empty = cursor.execute(f"SELECT NOT EXISTS (SELECT 1 FROM main.{table})")
+    if empty.fetchone()[0]:
+        cursor.execute(f"INSERT INTO main.{table} SELECT * FROM {source}.{table}")
+        return
+    columns = ", ".join(insert_target(query)[1])
+    merge_query = re.sub(
+        r"VALUES \([?, ]*\)",
+        f"SELECT {columns} FROM {source}.{table} WHERE true",
+        query,
+    )
+    cursor.execute(merge_query)
+
+
+def get_connection(db_path=None):
+    if db_path is None:
+        # Define the path to the database directory
+        folder_path = "./processed_data"
 
-    # Create the directory if it doesn't exist
-    os.makedirs(folder_path, exist_ok=True)
+        # Create the directory if it doesn't exist
+        os.makedirs(folder_path, exist_ok=True)
 
-    # Define the full path to the database file
-    db_path = os.path.join(folder_path, DATABASE_NAME)
+        # Define the full path to the database file
+        db_path = os.path.join(folder_path, DATABASE_NAME)
 
     # Connect to the SQLite database
     return sqlite3.connect(db_path)
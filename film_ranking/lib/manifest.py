@@ -0,0 +1,79 @@
+import hashlib
+import os
+import time
+
+
+def create_table_manifest(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS load_manifest (
+            file_name TEXT PRIMARY KEY,
+            table_name TEXT,
+            size INTEGER,
+            mtime REAL,
+            sha256 TEXT,
+            loaded_at REAL
+        )
+    """
+    )
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_unchanged(cursor, file_name, file_path):
+    """
+    Whether `file_path` holds the same content as the last time `file_name` was loaded.
+    Size and mtime are compared first, the content hash is only computed when the mtime
+    moved (e.g. a fresh download of the same dump).
+    """
+    create_table_manifest(cursor)
+    row = cursor.execute(
+        "SELECT size, mtime, sha256 FROM load_manifest WHERE file_name = ?",
+        (file_name,),
+    ).fetchone()
+    if row is None:
+        return False
+    size, mtime, sha256 = row
+    stat = os.stat(file_path)
+    if stat.st_size != size:
+        return False
+    if stat.st_mtime == mtime:
+        return True
+    if file_sha256(file_path) != sha256:
+        return False
+    cursor.execute(
+        "UPDATE load_manifest SET mtime = ? WHERE file_name = ?",
+        (stat.st_mtime, file_name),
+    )
+    return True
+
+
+def record_load(cursor, file_name, table, file_path):
+    create_table_manifest(cursor)
+    stat = os.stat(file_path)
+    cursor.execute(
+        """
+        INSERT INTO load_manifest (file_name, table_name, size, mtime, sha256, loaded_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(file_name) DO UPDATE SET
+            table_name=excluded.table_name,
+            size=excluded.size,
+            mtime=excluded.mtime,
+            sha256=excluded.sha256,
+            loaded_at=excluded.loaded_at
+    """,
+        (
+            file_name,
+            table,
+            stat.st_size,
+            stat.st_mtime,
+            file_sha256(file_path),
+            time.time(),
+        ),
+    )
@@ -1,10 +1,12 @@
-from playwright.sync_api import sync_playwright
 import re
 
 pattern = r"Country of origin\n(.*)"
 
 
 def get_country_of_origin(tconst: str):
+    # playwright is only needed here and slow to import
+    from playwright.sync_api import sync_playwright
+
     with sync_playwright() as p:
         browser = p.firefox.launch(headless=True)
         page = browser.new_page()
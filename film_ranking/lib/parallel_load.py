@@ -0,0 +1,107 @@
+import io
+import multiprocessing as mp
+import os
+import traceback
+
+# batches each worker may have waiting in the queue before it blocks
+QUEUE_DEPTH = 2
+
+
+class ByteRange(io.RawIOBase):
+    """
+    Read-only stream over `header` followed by the bytes [start, end) of a file, so a
+    slice of a delimited file can be handed to pandas as if it were a whole file.
+    """
+
+    def __init__(self, file_path, header, start, end):
+        self.file = open(file_path, "rb")
+        self.file.seek(start)
+        self.header = header
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.header:
+            size = min(len(buffer), len(self.header))
+            buffer[:size] = self.header[:size]
+            self.header = self.header[size:]
+            return size
+        size = min(len(buffer), self.remaining)
+        data = self.file.read(size)
+        buffer[: len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def split_byte_ranges(file_path, parts):
+    """
+    Split the rows of a delimited file into at most `parts` byte ranges that all start
+    at the beginning of a line. Returns the header line and the list of (start, end).
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        bounds = [f.tell()]
+        for part in range(1, parts):
+            offset = bounds[0] + (size - bounds[0]) * part // parts
+            if offset <= bounds[-1]:
+                continue
+            f.seek(offset - 1)
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+    return header, ranges
+
+
+def parse_range(reader, file_path, header, start, end, queue, reader_options):
+    try:
+        with io.BufferedReader(ByteRange(file_path, header, start, end)) as stream:
+            for rows in reader(stream, **reader_options):
+                queue.put(rows)
+        queue.put(None)
+    except Exception:
+        queue.put(traceback.format_exc())
+
+
+def parallel_chunk_reader(file_path, reader, workers=None, **reader_options):
+    """
+    Parse `file_path` in `workers` processes (default: one per core), each running
+    `reader` over its own line-aligned byte range. Parsed batches are yielded in the
+    calling process, which stays the only one writing to the database. The queue is
+    bounded, so workers block once the writer falls behind.
+    """
+    workers = workers or os.cpu_count()
+    header, ranges = split_byte_ranges(file_path, workers)
+    queue = mp.Queue(maxsize=len(ranges) * QUEUE_DEPTH)
+    processes = [
+        mp.Process(
+            target=parse_range,
+            args=(reader, file_path, header, start, end, queue, reader_options),
+            daemon=True,
+        )
+        for start, end in ranges
+    ]
+    for process in processes:
+        process.start()
+    try:
+        running = len(processes)
+        while running:
+            rows = queue.get()
+            if rows is None:
+                running -= 1
+            elif isinstance(rows, str):
+                raise RuntimeError(f"Failed to parse {file_path}:\n{rows}")
+            else:
+                yield rows
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
@@ -0,0 +1,204 @@
+"""
+Building blocks of the analyze queries. Values are always bound as parameters and
+sort columns are checked against a whitelist, so the SQL text only depends on the
+shape of a query and a long lived connection reuses its compiled statements.
+"""
+
+import re
+
+YEAR_RANGE = "{table}.startYear >= :year_start AND {table}.startYear <= :year_end"
+# the rows of one of :partitions partitions of the people, split on their numeric id
+PARTITION = "CAST(SUBSTR({table}.nconst, 3) AS INTEGER) % :partitions = :partition"
+
+# LIMIT bound to -1 returns every row
+NO_LIMIT = -1
+
+
+def match_query(keyword):
+    """
+    FTS5 query matching titles or names holding every word of `keyword`, the last one
+    as a prefix so partially typed words match. Without any word it matches nothing.
+    """
+    words = re.findall(r"\w+", keyword or "")
+    if not words:
+        return '""'
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def listed_hits(id_column):
+    """Hits CTE of the ids in the :ids JSON array, ranked by their position in it."""
+    return f"SELECT value AS {id_column}, key AS rank FROM json_each(:ids)"
+
+
+def person_filter(table, partitioned=False):
+    """Year range condition on the person rows of `table`, optionally partitioned."""
+    where = YEAR_RANGE.format(table=table)
+    if partitioned:
+        where += " AND " + PARTITION.format(table=table)
+    return where
+
+
+def compose(ctes, select):
+    """`select` preceded by the WITH clause of `ctes` ({name: query}), in order."""
+    if not ctes:
+        return select
+    clauses = ",\n".join(f"{name} AS ({sql})" for name, sql in ctes.items())
+    return f"WITH {clauses}\n{select}"
+
+
+def sort_column(sort_by, choices):
+    """The quoted column to sort by, which has to be one of `choices`."""
+    if sort_by not in choices:
+        raise ValueError(f"Cannot sort by {sort_by!r}, expected one of {choices}")
+    return f'"{sort_by}"'
+
+
+def limit_param(limit):
+    return NO_LIMIT if limit is None else int(limit)
+
+
+def page_clauses(id_column, sort_by, after=None):
+    """
+    WHERE and ORDER BY clauses selecting the page of a ranking sorted by `sort_by`
+    descending, ties broken by `id_column`, that follows `after`: the (sort value, id)
+    of the last row of the previous page. Rows without a value rank as 0, so every
+    row has a position the cursor can point to.
+    """
+    key = f"COALESCE({sort_by}, 0)"
+    order = f"ORDER BY {key} DESC, {id_column}"
+    if not after:
+        return "", order, {}
+    where = (
+        f"WHERE {key} < :after_key OR ({key} = :after_key AND {id_column} > :after_id)"
+    )
+    return where, order, dict(after_key=after[0], after_id=after[1])
+
+
+def person_aggregates(where):
+    """Totals of the :role year buckets of every person matching `where`."""
+    return f"""
+        SELECT
+            s.nconst,
+            SUM(s.movieCount) AS movieCount,
+            SUM(s.sumRatings) / SUM(s.movieCount) AS avgRating,
+            SUM(s.totalVotes) AS totalVotes,
+            SUM(s.sumRatings) / SUM(s.movieCount) * SUM(s.totalVotes) AS totalProduct,
+            SUM(s.moviesWithAwards) AS moviesWithAwards,
+            SUM(s.movieCount) - SUM(s.moviesWithAwards) AS moviesWithoutAwards
+        FROM
+            person_year_stats s
+        WHERE
+            s.role = :role AND {where}
+        GROUP BY
+            s.nconst
+    """
+
+
+def person_movies(person, where=None):
+    """Subquery listing the titles of the :role buckets of `person` chronologically."""
+    return f"""(
+            SELECT GROUP_CONCAT(movies) FROM (
+                SELECT s.movies
+                FROM person_year_stats s
+                WHERE s.role = :role AND s.nconst = {person}
+                    {"AND " + where if where else ""}
+                ORDER BY s.startYear
+            )
+        )"""
+
+
+def actor_regions(where):
+    return f"""
+        SELECT
+            r.nconst,
+            GROUP_CONCAT(DISTINCT r.region) AS regions,
+            COUNT(DISTINCT r.region) AS countryCount
+        FROM
+            actor_year_regions r
+        WHERE
+            {where}
+        GROUP BY
+            r.nconst
+    """
+
+
+def country_cinema_data(source, films, votes, avg_rating, where=None):
+    """
+    Film statistics of every country, from `source` (aliased c) where `films`, `votes`
+    and `avg_rating` aggregate the titles of a region.
+    """
+    return f"""
+        SELECT
+            c.region,
+            countries.country AS countryName,
+            countries.population,
+            countries.gdp_capita,
+            countries.gdp_capita * countries.population AS gdp,
+            {films} AS numFilms,
+            {votes} AS votes,
+            {avg_rating} AS avgRating,
+            {votes} * {avg_rating} AS qualityScore,
+            CAST(countries.population / {films} AS FLOAT) AS populationPerFilm,
+            CAST({films} / (countries.gdp_capita * countries.population) AS FLOAT) AS filmPerGdp,
+            CAST((countries.gdp_capita * countries.population) / {films} AS FLOAT) AS gdpPerFilm,
+            CAST({films} / countries.gdp_capita AS FLOAT) AS gdpCapitaPerFilm
+        FROM
+            {source} c
+        JOIN countries ON countries.abbreviation = c.region
+        {"WHERE " + where if where else ""}
+        GROUP BY
+            c.region
+    """
+
+
+COUNTRY_RANKS = """
+        SELECT
+            countryName,
+            gdp,
+            numFilms,
+            qualityScore,
+            ROW_NUMBER() OVER (ORDER BY gdp DESC) AS gdp_rank,
+            ROW_NUMBER() OVER (ORDER BY numFilms DESC) AS weak_cinematic_impact_rank,
+            ROW_NUMBER() OVER (ORDER BY qualityScore DESC) AS strong_cinematic_impact_rank
+        FROM
+            country_cinema_data
+    """
+
+COUNTRY_COLUMNS = """
+        ccd.region AS region,
+        ccd.countryName AS countryName,
+        ccd.population AS population,
+        ccd.gdp_capita AS gdp_capita,
+        ccd.gdp AS gdp,
+        ccd.numFilms AS numFilms,
+        ccd.votes AS votes,
+        ccd.avgRating AS avgRating,
+        ccd.qualityScore AS qualityScore,
+        ccd.populationPerFilm AS populationPerFilm,
+        ccd.filmPerGdp AS filmPerGdp,
+        ccd.gdpPerFilm AS gdpPerFilm,
+        ccd.gdpCapitaPerFilm AS gdpCapitaPerFilm,
+        cr.gdp_rank AS gdp_rank,
+        cr.weak_cinematic_impact_rank AS weak_cinematic_impact_rank,
+        cr.strong_cinematic_impact_rank AS strong_cinematic_impact_rank,
+        (cr.gdp_rank - cr.weak_cinematic_impact_rank) AS weak_cinematic_impact_difference,
+        (cr.gdp_rank - cr.strong_cinematic_impact_rank) AS strong_cinematic_impact_difference
+    FROM
+        country_cinema_data ccd
+    JOIN
+        country_ranks cr ON ccd.countryName = cr.countryName
+"""
+
+TITLE_COLUMNS = """
+        f.primaryTitle,
+        f.region,
+        f.numVotes,
+        f.averageRating,
+        f.product,
+        a.awards,
+        f.awardsCount AS awards_count
+    FROM
+        title_facts f
+    LEFT JOIN
+        award_stats a ON f.tconst = a.const
+"""
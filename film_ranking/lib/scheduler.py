@@ -0,0 +1,170 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from colorama import Fore
+
+from .load_data import (
+    DATA_FILES,
+    create_indexes,
+    drop_digests,
+    drop_indexes,
+    get_connection,
+    load_table,
+    merge_table,
+)
+from .manifest import file_unchanged, record_load
+from .util import print_color
+
+STAGING_FOLDER = "./processed_data/staging"
+
+
+def stage_file(file_name, file_path, staging_path, options):
+    """
+    Load one source file into its own staging database, without secondary indexes.
+    Runs in a worker process, so nothing here may touch film.db.
+    """
+    table, create_table, ingest, _ = DATA_FILES[file_name]
+    started = time.time()
+    if os.path.exists(staging_path):
+        os.remove(staging_path)
+    conn = get_connection(staging_path)
+    cursor = conn.cursor()
+    create_table(cursor, with_indexes=False)
+    conn.commit()
+    rows = ingest(conn, cursor, file_path, **options)
+    conn.close()
+    return dict(table=table, rows=rows, started=started, staged=time.time())
+
+
+def merge_staged_file(conn, file_name, staging_path, defer_indexes=False):
+    table, create_table, _, query = DATA_FILES[file_name]
+    cursor = conn.cursor()
+    create_table(cursor, with_indexes=not defer_indexes)
+    if defer_indexes:
+        drop_indexes(cursor, table)
+    drop_digests(cursor, table)
+    conn.commit()
+    cursor.execute("ATTACH DATABASE ? AS staging", (staging_path,))
+    merge_table(cursor, table, query, "staging")
+    conn.commit()
+    cursor.execute("DETACH DATABASE staging")
+    if defer_indexes:
+        create_indexes(cursor, table)
+        conn.commit()
+    os.remove(staging_path)
+
+
+def load_files(
+    files,
+    jobs=1,
+    dependencies=None,
+    defer_indexes=False,
+    incremental=False,
+    **options,
+):
+    """
+    Load `files` ({source file name: path}) into film.db and return the timeline of
+    every table. With `jobs` > 1 up to that many files are loaded at the same time,
+    each into its own staging database, and merged into film.db by this process as
+    soon as they are done. `dependencies` ({file name: set of file names}) holds a
+    file back until everything it depends on has been merged.
+
+    With `incremental` files whose content did not change since the last load are
+    skipped and changed files are applied as row level deltas directly on film.db.
+    """
+    dependencies = dependencies or {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    if incremental:
+        unchanged = {
+            file_name
+            for file_name, file_path in files.items()
+            if file_unchanged(cursor, file_name, file_path)
+        }
+        conn.commit()
+        for file_name in unchanged:
+            print_color(f"Skipping {file_name}, unchanged", Fore.WHITE)
+        files = {name: path for name, path in files.items() if name not in unchanged}
+
+    timeline = []
+    if jobs <= 1 or incremental:
+        for file_name, file_path in files.items():
+            table, create_table, ingest, _ = DATA_FILES[file_name]
+            print_color(f"Loading {table}...", Fore.WHITE)
+            started = time.time()
+            rows = load_table(
+                table,
+                create_table,
+                ingest,
+                file_path,
+                defer_indexes=defer_indexes,
+                incremental=incremental,
+                **options,
+            )
+            record_load(cursor, file_name, table, file_path)
+            conn.commit()
+            finished = time.time()
+            timeline.append(
+                dict(
+                    table=table,
+                    rows=rows,
+                    started=started,
+                    staged=finished,
+                    merged=finished,
+                )
+            )
+        conn.close()
+        return timeline
+
+    os.makedirs(STAGING_FOLDER, exist_ok=True)
+    pending = dict(files)
+    merged = set()
+    running = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for file_name in list(pending):
+                if dependencies.get(file_name, set()) <= merged:
+                    staging_path = os.path.join(STAGING_FOLDER, f"{file_name}.db")
+                    future = executor.submit(
+                        stage_file,
+                        file_name,
+                        pending.pop(file_name),
+                        staging_path,
+                        options,
+                    )
+                    running[future] = (file_name, staging_path)
+            if not running:
+                raise ValueError(f"Unsatisfiable load dependencies: {dependencies}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_name, staging_path = running.pop(future)
+                entry = future.result()
+                print_color(f"Merging {entry['table']}...", Fore.WHITE)
+                merge_staged_file(conn, file_name, staging_path, defer_indexes)
+                record_load(cursor, file_name, entry["table"], files[file_name])
+                conn.commit()
+                entry["merged"] = time.time()
+                timeline.append(entry)
+                merged.add(file_name)
+    conn.close()
+    return timeline
+
+
+def print_timeline(timeline):
+    if not timeline:
+        return
+    origin = min(entry["started"] for entry in timeline)
+    critical = max(timeline, key=lambda entry: entry["merged"])
+    for entry in sorted(timeline, key=lambda entry: entry["started"]):
+        print_color(
+            f"{entry['table']:<12} {entry['rows']:>12} rows  "
+            f"{entry['started'] - origin:8.1f}s -> {entry['merged'] - origin:8.1f}s  "
+            f"(load {entry['staged'] - entry['started']:.1f}s, "
+            f"merge {entry['merged'] - entry['staged']:.1f}s)",
+            Fore.YELLOW if entry is critical else Fore.WHITE,
+        )
+    print_color(
+        f"Critical path: {critical['table']} ({critical['merged'] - origin:.1f}s)",
+        Fore.GREEN,
+    )
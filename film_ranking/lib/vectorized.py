@@ -0,0 +1,424 @@
+"""
+NumPy engine of the rankings. The columns of the derived tables are read once per
+database state and kept in memory as arrays, people and regions coded as integers,
+so a ranking is a mask over the year buckets followed by bincount aggregates and a
+partial sort. Only the text columns of the returned page are read from SQLite, with
+the same subqueries as the SQL engine, so both return the same DataFrames.
+"""
+
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .connections import DATABASE_PATH, file_stamp, get_read_connection
+from .query import YEAR_RANGE, person_movies
+
+PERSON_ROLES = ("director", "producer", "actor")
+
+_lock = threading.Lock()
+# name -> (database stamp, columns)
+_loaded = {}
+
+
+def load_titles(conn):
+    titles = pd.read_sql_query(
+        """
+        SELECT tconst, titleType, genres, region, startYear, numVotes, averageRating,
+            product, awardsCount
+        FROM title_facts
+        ORDER BY tconst
+    """,
+        conn,
+    )
+    return {column: titles[column].to_numpy() for column in titles.columns}
+
+
+def load_people(conn):
+    """Year buckets of every named person, with their awards count."""
+    buckets = pd.read_sql_query(
+        """
+        SELECT s.role, s.nconst, s.startYear, s.movieCount, s.totalVotes,
+            s.sumRatings, s.moviesWithAwards
+        FROM person_year_stats s
+        WHERE s.nconst IN (SELECT nconst FROM name_basics)
+    """,
+        conn,
+    )
+    person, people = pd.factorize(buckets["nconst"])
+    awards = pd.read_sql_query("SELECT const, awardsCount FROM award_stats", conn)
+    awarded = people.get_indexer(awards["const"])
+    awards_count = np.zeros(len(people))
+    awards_count[awarded[awarded >= 0]] = awards["awardsCount"][awarded >= 0]
+    return dict(
+        role=pd.Categorical(buckets["role"], categories=PERSON_ROLES).codes,
+        person=person,
+        people=np.asarray(people, dtype=object),
+        year=buckets["startYear"].to_numpy(dtype=float),
+        movie_count=buckets["movieCount"].to_numpy(),
+        total_votes=buckets["totalVotes"].to_numpy(dtype=float),
+        sum_ratings=buckets["sumRatings"].to_numpy(dtype=float),
+        movies_with_awards=buckets["moviesWithAwards"].to_numpy(),
+        awards_count=awards_count,
+    )
+
+
+def load_actor_regions(conn):
+    regions = pd.read_sql_query(
+        "SELECT nconst, startYear, region FROM actor_year_regions", conn
+    )
+    people = pd.Index(columns("people")["people"])
+    region, names = pd.factorize(regions["region"])
+    return dict(
+        person=people.get_indexer(regions["nconst"]),
+        year=regions["startYear"].to_numpy(dtype=float),
+        region=region,
+        regions=len(names),
+    )
+
+
+def load_countries(conn):
+    stats = pd.read_sql_query(
+        "SELECT region, startYear, numFilms, votes, sumRatings FROM country_year_stats",
+        conn,
+    )
+    region, regions = pd.factorize(stats["region"])
+    countries = pd.read_sql_query(
+        "SELECT abbreviation, country, population, gdp_capita FROM countries", conn
+    )
+    return dict(
+        region=region,
+        regions=np.asarray(regions, dtype=object),
+        year=stats["startYear"].to_numpy(dtype=float),
+        films=stats["numFilms"].to_numpy(),
+        votes=stats["votes"].to_numpy(dtype=float),
+        sum_ratings=stats["sumRatings"].to_numpy(dtype=float),
+        countries=countries,
+    )
+
+
+LOADERS = dict(
+    titles=load_titles,
+    people=load_people,
+    actor_regions=load_actor_regions,
+    countries=load_countries,
+)
+
+
+def columns(name: str):
+    """The `name` columns of the current database, loaded on first use."""
+    stamp = file_stamp(DATABASE_PATH)
+    with _lock:
+        cached = _loaded.get(name)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    loaded = LOADERS[name](get_read_connection())
+    with _lock:
+        _loaded[name] = (stamp, loaded)
+    return loaded
+
+
+def clear_columns():
+    with _lock:
+        _loaded.clear()
+
+
+def in_years(year, year_start, year_end):
+    return (year >= year_start) & (year <= year_end)
+
+
+def ranking_order(keys, ids, limit=None, after=None):
+    """
+    Positions of the rows ranked by `keys` descending, ties broken by `ids`, missing
+    keys ranking as 0, following the `after` cursor like page_clauses.
+    """
+    keys = np.nan_to_num(np.asarray(keys, dtype=float), nan=0.0)
+    candidates = np.arange(len(keys))
+    if after:
+        after_key, after_id = after
+        candidates = np.flatnonzero(
+            (keys < after_key) | ((keys == after_key) & (ids > after_id))
+        )
+    if limit is not None and int(limit) < len(candidates):
+        kth = len(candidates) - int(limit)
+        threshold = np.partition(keys[candidates], kth)[kth]
+        candidates = candidates[keys[candidates] >= threshold]
+    order = candidates[np.lexsort((ids[candidates], -keys[candidates]))]
+    return order if limit is None else order[: int(limit)]
+
+
+def read_page(query: str, ids, params: dict):
+    """`query` over the ids of a page, bound as the :ids JSON array, in page order."""
+    params = dict(params, ids=json.dumps(list(ids)))
+    return pd.read_sql_query(query, get_read_connection(), params=params)
+
+
+def person_totals(role: str, year_start: int, year_end: int):
+    """
+    Totals of the year buckets of every person with a `role` title in the range, as
+    person_aggregates computes them.
+    """
+    people = columns("people")
+    mask = (people["role"] == PERSON_ROLES.index(role)) & in_years(
+        people["year"], year_start, year_end
+    )
+    person = people["person"][mask]
+    size = len(people["people"])
+
+    def total(values):
+        return np.bincount(person, weights=values[mask], minlength=size)[ranked]
+
+    ranked = np.flatnonzero(np.bincount(person, minlength=size))
+    movie_count = np.rint(total(people["movie_count"])).astype(np.int64)
+    total_votes = np.rint(total(people["total_votes"])).astype(np.int64)
+    with_awards = np.rint(total(people["movies_with_awards"])).astype(np.int64)
+    avg_rating = total(people["sum_ratings"]) / movie_count
+    return dict(
+        person=ranked,
+        nconst=people["people"][ranked],
+        movieCount=movie_count,
+        sortAwardsCount=people["awards_count"][ranked],
+        avgRating=avg_rating,
+        totalVotes=total_votes,
+        totalProduct=avg_rating * total_votes,
+        moviesWithAwards=with_awards,
+        moviesWithoutAwards=movie_count - with_awards,
+    )
+
+
+def person_page(role, totals, sort_by, limit, after, year_start, year_end):
+    """
+    The page of the ranking of `totals` by `sort_by`, with the name, movies and awards
+    of its people read from SQLite.
+    """
+    key = "sortAwardsCount" if sort_by == "awardsCount" else sort_by
+    order = ranking_order(totals[key], totals["nconst"], limit, after)
+    page = pd.DataFrame({column: values[order] for column, values in totals.items()})
+    details = read_page(
+        f"""
+        SELECT
+            n.primaryName,
+            {person_movies("j.value", YEAR_RANGE.format(table="s"))} AS movies,
+            a.awards,
+            a.awardsCount
+        FROM json_each(:ids) j
+        JOIN name_basics n ON n.nconst = j.value
+        LEFT JOIN award_stats a ON a.const = j.value
+        ORDER BY j.key
+    """,
+        page["nconst"],
+        dict(role=role, year_start=year_start, year_end=year_end),
+    )
+    return pd.concat([page, details], axis=1)
+
+
+def get_directors_rank(yearStart, yearEnd, sort_by, limit=None, after=None):
+    totals = person_totals("director", yearStart, yearEnd)
+    movie_count = totals["movieCount"]
+    with_awards = totals["moviesWithAwards"]
+    # integer divisions, like SQLite's on the integer sums
+    totals["finalAssessmentValue"] = (
+        (3 * with_awards + totals["moviesWithoutAwards"])
+        // movie_count
+        * totals["avgRating"]
+        * totals["totalVotes"]
+    )
+    totals["awardPercentage"] = with_awards * 100 // movie_count
+    page = person_page("director", totals, sort_by, limit, after, yearStart, yearEnd)
+    return page.rename(columns=dict(nconst="directorId", primaryName="directorName"))[
+        [
+            "directorId",
+            "directorName",
+            "movies",
+            "movieCount",
+            "awards",
+            "awardsCount",
+            "avgRating",
+            "totalVotes",
+            "totalProduct",
+            "moviesWithAwards",
+            "moviesWithoutAwards",
+            "finalAssessmentValue",
+            "awardPercentage",
+        ]
+    ]
+
+
+def get_producers_rank(yearStart, yearEnd, sort_by, limit=None, after=None):
+    totals = person_totals("producer", yearStart, yearEnd)
+    page = person_page("producer", totals, sort_by, limit, after, yearStart, yearEnd)
+    return page.rename(
+        columns=dict(nconst="producerId", primaryName="producerName", movies="movie")
+    )[
+        [
+            "producerId",
+            "producerName",
+            "movie",
+            "movieCount",
+            "awards",
+            "awardsCount",
+            "avgRating",
+            "totalVotes",
+            "totalProduct",
+        ]
+    ]
+
+
+def get_actors_rank(yearStart, yearEnd, sort_by, limit=None, after=None):
+    totals = person_totals("actor", yearStart, yearEnd)
+    regions = columns("actor_regions")
+    mask = in_years(regions["year"], yearStart, yearEnd) & (regions["person"] >= 0)
+    pairs = np.unique(
+        regions["person"][mask].astype(np.int64) * regions["regions"]
+        + regions["region"][mask]
+    )
+    size = len(columns("people")["people"])
+    country_count = np.bincount(pairs // regions["regions"], minlength=size)
+    totals["countryCount"] = country_count[totals["person"]]
+    page = person_page("actor", totals, sort_by, limit, after, yearStart, yearEnd)
+    page["regions"] = read_page(
+        f"""
+        SELECT (
+            SELECT GROUP_CONCAT(DISTINCT r.region)
+            FROM actor_year_regions r
+            WHERE r.nconst = j.value AND {YEAR_RANGE.format(table="r")}
+        ) AS regions
+        FROM json_each(:ids) j
+        ORDER BY j.key
+    """,
+        page["nconst"],
+        dict(year_start=yearStart, year_end=yearEnd),
+    )["regions"]
+    return page.rename(columns=dict(nconst="actorId", primaryName="actorName"))[
+        [
+            "actorId",
+            "actorName",
+            "movies",
+            "movieCount",
+            "awards",
+            "awardsCount",
+            "avgRating",
+            "totalVotes",
+            "totalProduct",
+            "regions",
+            "countryCount",
+        ]
+    ]
+
+
+def get_cinematic_rank(
+    year_start, year_end, limit=None, genre=None, mtype=None, country=None, sort_by=None
+):
+    titles = columns("titles")
+    mask = in_years(titles["startYear"], year_start, year_end)
+    if genre:
+        mask &= titles["genres"] == genre
+    if mtype:
+        mask &= titles["titleType"] == mtype
+    if country:
+        mask &= titles["region"] == country
+    selected = np.flatnonzero(mask)
+    key = "awardsCount" if sort_by == "awards_count" else "product"
+    order = selected[
+        ranking_order(titles[key][selected], titles["tconst"][selected], limit)
+    ]
+    page = read_page(
+        """
+        SELECT j.value AS titleId, f.primaryTitle, a.awards
+        FROM json_each(:ids) j
+        JOIN title_facts f ON f.tconst = j.value
+        LEFT JOIN award_stats a ON a.const = j.value
+        ORDER BY j.key
+    """,
+        titles["tconst"][order],
+        {},
+    )
+    for column in ("region", "numVotes", "averageRating", "product"):
+        page[column] = titles[column][order]
+    page["awards_count"] = titles["awardsCount"][order]
+    return page[
+        [
+            "titleId",
+            "primaryTitle",
+            "region",
+            "numVotes",
+            "averageRating",
+            "product",
+            "awards",
+            "awards_count",
+        ]
+    ]
+
+
+def row_numbers(values):
+    """ROW_NUMBER() OVER (ORDER BY `values` DESC), missing values last."""
+    order = np.argsort(-np.nan_to_num(values, nan=-np.inf), kind="stable")
+    numbers = np.empty(len(values), dtype=np.int64)
+    numbers[order] = np.arange(1, len(values) + 1)
+    return numbers
+
+
+def get_movies_with_regional_data(yearStart, yearEnd, sort_by):
+    stats = columns("countries")
+    mask = in_years(stats["year"], yearStart, yearEnd)
+    region = stats["region"][mask]
+    size = len(stats["regions"])
+    present = np.flatnonzero(np.bincount(region, minlength=size))
+    films = np.bincount(region, weights=stats["films"][mask], minlength=size)
+    films = np.rint(films[present]).astype(np.int64)
+    votes = np.bincount(region, weights=stats["votes"][mask], minlength=size)[present]
+    ratings = np.bincount(region, weights=stats["sum_ratings"][mask], minlength=size)
+    data = pd.DataFrame(
+        dict(
+            region=stats["regions"][present],
+            numFilms=films,
+            votes=np.rint(votes).astype(np.int64),
+            avgRating=ratings[present] / films,
+        )
+    )
+    countries = stats["countries"].drop_duplicates("abbreviation")
+    data = data.merge(countries, left_on="region", right_on="abbreviation")
+    data = data.rename(columns=dict(country="countryName"))
+    population = data["population"].astype(float)
+    data["gdp"] = data["gdp_capita"] * population
+    data["qualityScore"] = data["votes"] * data["avgRating"]
+    # population is an integer column, SQLite divides it by numFilms as integers
+    data["populationPerFilm"] = np.floor(population / data["numFilms"])
+    data["filmPerGdp"] = data["numFilms"] / data["gdp"]
+    data["gdpPerFilm"] = data["gdp"] / data["numFilms"]
+    data["gdpCapitaPerFilm"] = data["numFilms"] / data["gdp_capita"]
+    data["gdp_rank"] = row_numbers(data["gdp"].to_numpy())
+    data["weak_cinematic_impact_rank"] = row_numbers(
+        data["numFilms"].to_numpy(dtype=float)
+    )
+    data["strong_cinematic_impact_rank"] = row_numbers(data["qualityScore"].to_numpy())
+    data["weak_cinematic_impact_difference"] = (
+        data["gdp_rank"] - data["weak_cinematic_impact_rank"]
+    )
+    data["strong_cinematic_impact_difference"] = (
+        data["gdp_rank"] - data["strong_cinematic_impact_rank"]
+    )
+    data = data.iloc[row_numbers(data[sort_by].to_numpy(dtype=float)).argsort()]
+    return data[
+        [
+            "region",
+            "countryName",
+            "population",
+            "gdp_capita",
+            "gdp",
+            "numFilms",
+            "votes",
+            "avgRating",
+            "qualityScore",
+            "populationPerFilm",
+            "filmPerGdp",
+            "gdpPerFilm",
+            "gdpCapitaPerFilm",
+            "gdp_rank",
+            "weak_cinematic_impact_rank",
+            "strong_cinematic_impact_rank",
+            "weak_cinematic_impact_difference",
+            "strong_cinematic_impact_difference",
+        ]
+    ].reset_index(drop=True)
@@ -0,0 +1,69 @@
+import io
+import threading
+from argparse import Namespace
+
+import pytest
+
+from film_ranking.cli.daemon import DaemonServer, forward_request
+from film_ranking.cli.output import run_command
+
+
+def command(**args):
+    defaults = dict(engine=None, format="table", report=False, start_year=1900)
+    return Namespace(**dict(defaults, end_year=2024, **args))
+
+
+def test_run_command(film_db):
+    out, err = io.StringIO(), io.StringIO()
+    args = command(
+        command="analyze",
+        analyze_type="top_actors",
+        sort_by=None,
+        limit=1,
+        after=None,
+        format="csv",
+    )
+    assert run_command(args, out, err)
+    assert out.getvalue().splitlines()[1].startswith("nm0000003,Actor Three,")
+    assert err.getvalue().startswith("Next page: -after ")
+    assert not run_command(command(command="load_data"), out, err)
+
+
+@pytest.fixture
+def daemon(film_db):
+    path = str(film_db / "film_ranking.sock")
+    server = DaemonServer(path, threads=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_daemon_answers(daemon):
+    args = command(command="complete", complete_entity="person", prefix="Act", limit=2)
+    response = forward_request(daemon, args)
+    assert response["handled"] and response["status"] == 0
+    assert response["stdout"].splitlines() == [
+        "Actor Three\t3500\tnm0000003",
+        "Actor Five\t2550\tnm0000005",
+    ]
+    # a liveness check runs nothing
+    assert forward_request(daemon, None) == dict(handled=False)
+
+
+def test_daemon_reports_errors(daemon):
+    args = command(
+        command="analyze",
+        analyze_type="top_directors",
+        sort_by="nope",
+        limit=None,
+        after=None,
+    )
+    response = forward_request(daemon, args)
+    assert response["status"] == 1
+    assert "Cannot sort by 'nope'" in response["stderr"]
+
+
+def test_no_daemon(tmp_path):
+    assert forward_request(str(tmp_path / "missing.sock"), None) is None
@@ -0,0 +1,130 @@
+import asyncio
+import io
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from film_ranking.cli import service
+from film_ranking.cli.service import QueryService, SingleFlight, serve_http
+
+
+async def fetch(port, target):
+    """(status, headers, body) of GET `target`, de-chunked."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    head, _, chunked = (await reader.read()).partition(b"\r\n\r\n")
+    writer.close()
+    status_line, *lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines)
+    body = b""
+    while True:
+        size, _, chunked = chunked.partition(b"\r\n")
+        if not int(size, 16):
+            break
+        body += chunked[: int(size, 16)]
+        chunked = chunked[int(size, 16) + 2 :]
+    return int(status_line.split()[1]), headers, body
+
+
+def run_with_server(*targets):
+    """The responses to `targets`, requested at the same time of a served service."""
+
+    async def main():
+        started = asyncio.get_running_loop().create_future()
+        server = asyncio.ensure_future(
+            serve_http("127.0.0.1", 0, 2, ready=started.set_result)
+        )
+        port = (await started).sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*(fetch(port, target) for target in targets))
+        finally:
+            server.cancel()
+
+    return asyncio.run(main())
+
+
+def test_endpoints(film_db):
+    search, top, compare, missing = run_with_server(
+        "/search/movie?keyword=Alpha&limit=1",
+        "/top/actors?sort_by=movieCount&limit=1&format=csv",
+        "/compare/director?director1=nm0000001&director2=nm0000002&format=ndjson",
+        "/top/writers",
+    )
+    assert search[0] == 200
+    assert search[1]["Content-Type"] == "application/json"
+    assert [row["tconst"] for row in json.loads(search[2])] == ["tt0000001"]
+    assert top[0] == 200
+    df = pd.read_csv(io.BytesIO(top[2]))
+    assert df["actorId"].tolist() == ["nm0000003"]
+    # the after of the next page
+    assert top[1]["X-Next-After"] == "3,nm0000003"
+    rows = [json.loads(line) for line in compare[2].splitlines()]
+    assert [row["directorId"] for row in rows] == ["nm0000001"]
+    assert missing[0] == 404
+
+
+@pytest.mark.parametrize("engine", ["sqlite", "numpy"])
+def test_unknown_sort(film_db, engine):
+    rankings = ["movies", "countries", "directors", "producers", "actors"]
+    responses = run_with_server(
+        *(f"/top/{ranking}?sort_by=bogus&engine={engine}" for ranking in rankings)
+    )
+    for status, _, body in responses:
+        assert status == 400
+        assert "Cannot sort by 'bogus'" in json.loads(body)["error"]
+
+
+def test_errors(film_db):
+    responses = run_with_server(
+        "/top/directors?sort_by=nope",
+        "/top/actors?limit=ten",
+        "/search/person",
+        "/top/actors?format=xml",
+    )
+    assert [status for status, _, _ in responses] == [400] * 4
+    assert "Cannot sort by 'nope'" in json.loads(responses[0][2])["error"]
+
+
+def test_streams_chunks(film_db, monkeypatch):
+    monkeypatch.setattr(service, "CHUNK_ROWS", 2)
+
+    async def main():
+        query_service = QueryService(1)
+        try:
+            status, _, body = await query_service.respond("GET", "/top/actors")
+            return status, [chunk async for chunk in body]
+        finally:
+            query_service.close()
+
+    status, chunks = asyncio.run(main())
+    assert status == 200
+    assert len(chunks) == 4
+    # "[", two chunks of two and one actor, "]"
+    rows = json.loads(b"".join(chunks))
+    assert len(rows) == 3 and rows[0]["actorId"] == "nm0000003"
+
+
+def test_single_flight():
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return len(calls)
+
+    async def main():
+        flights = SingleFlight()
+        loop = asyncio.get_running_loop()
+        call = lambda: loop.run_in_executor(None, compute)
+        waiting = [asyncio.ensure_future(flights.run("key", call)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        coalesced = await asyncio.gather(*waiting)
+        # a later call computes again
+        return coalesced, await flights.run("key", call)
+
+    assert asyncio.run(main()) == ([1, 1, 1], 2)
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+# every other command starts without these
+HEAVY_MODULES = {"pandas", "numpy", "papermill", "nbformat", "nbconvert", "playwright"}
+# cumulative import time of the CLI, in microseconds
+IMPORT_BUDGET = 150_000
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def import_times(*args):
+    """{module: cumulative import time} of `python -X importtime *args`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            _, cumulative, module = line.split("|")
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_help_skips_heavy_imports():
+    times = import_times("-m", "film_ranking", "--help")
+    assert not {module.split(".")[0] for module in times} & HEAVY_MODULES
+    assert times["film_ranking.cli"] < IMPORT_BUDGET
+
+
+def test_loaders_skip_playwright():
+    times = import_times("-c", "import film_ranking.lib.load_data")
+    assert "playwright" not in times
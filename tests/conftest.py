@@ -0,0 +1,123 @@
+import pytest
+from film_ranking.lib.derived import refresh_derived_tables
+from film_ranking.lib.load_data import DATA_FILES, find_data_file, get_connection
+from film_ranking.lib.scheduler import load_files
+
+BASICS = """tconst	titleType	primaryTitle	originalTitle	isAdult	startYear	endYear	runtimeMinutes	genres
+tt0000001	movie	Alpha	Alpha	0	2000	\\N	100	Drama
+tt0000002	movie	Beta	Beta	0	2001	\\N	90	Comedy
+tt0000003	short	Gamma	Gamma	0	2002	\\N	10	Drama
+tt0000004	movie	Delta	Delta	0	2010	\\N	120	Family
+tt0000005	tvSeries	Epsilon	Epsilon	0	2001	2003	30	Drama
+tt0000006	movie	Zeta	Zeta	0	1990	\\N	95	Drama
+"""
+
+AKAS = """titleId	ordering	title	region	language	types	attributes	isOriginalTitle
+tt0000001	1	Alpha	\\N	\\N	original	\\N	1
+tt0000001	2	Alpha	AR	\\N	\\N	\\N	0
+tt0000001	3	Alpha	AF	\\N	\\N	\\N	0
+tt0000002	1	Beta	\\N	\\N	original	\\N	1
+tt0000002	2	beta	AL	\\N	\\N	\\N	0
+tt0000003	1	Gamma	AR	\\N	\\N	\\N	0
+tt0000003	2	Gamma X	AF	\\N	\\N	\\N	0
+tt0000004	1	Delta	AF	\\N	\\N	\\N	0
+tt0000004	2	Délta Fórce	\\N	\\N	\\N	\\N	0
+tt0000005	1	Epsilon	AL	\\N	\\N	\\N	0
+tt0000005	2	Epsilon	USA	\\N	\\N	\\N	0
+tt0000006	1	Zeta	\\N	\\N	original	\\N	1
+"""
+
+RATINGS = """tconst	averageRating	numVotes
+tt0000001	8.0	1000
+tt0000002	6.0	500
+tt0000003	7.0	100
+tt0000004	9.0	2000
+tt0000005	5.0	50
+tt0000006	7.5	300
+"""
+
+NAME_BASICS = """nconst	primaryName	birthYear	deathYear	primaryProfession	knownForTitles
+nm0000001	Director One	1950	\\N	director	tt0000001,tt0000002
+nm0000002	Producer Two	1960	\\N	producer	tt0000004
+nm0000003	Actor Three	1970	\\N	actor	tt0000001,tt0000004
+nm0000004	Actress Four	1980	\\N	actress	tt0000003
+nm0000005	Actor Five	1985	\\N	actor	tt0000005
+"""
+
+PRINCIPALS = """tconst	ordering	nconst	category	job	characters
+tt0000001	1	nm0000001	director	\\N	\\N
+tt0000001	2	nm0000002	producer	producer	\\N
+tt0000001	3	nm0000003	actor	\\N	["A"]
+tt0000001	4	nm0000004	actress	\\N	["B"]
+tt0000002	1	nm0000001	director	\\N	\\N
+tt0000002	2	nm0000003	actor	\\N	["C"]
+tt0000002	3	nm0000005	actor	\\N	["D"]
+tt0000003	1	nm0000001	director	\\N	\\N
+tt0000003	2	nm0000004	actress	\\N	["E"]
+tt0000004	1	nm0000002	producer	producer	\\N
+tt0000004	2	nm0000003	actor	\\N	["F"]
+tt0000004	3	nm0000005	actor	\\N	["G"]
+tt0000005	1	nm0000005	actor	\\N	["H"]
+tt0000005	2	nm0000002	producer	producer	\\N
+tt0000006	1	nm0000001	director	\\N	\\N
+"""
+
+CREW = """tconst	directors	writers
+tt0000001	nm0000001	\\N
+tt0000002	nm0000001	\\N
+"""
+
+EPISODES = """tconst	parentTconst	seasonNumber	episodeNumber
+tt0000007	tt0000005	1	1
+"""
+
+AWARDS = """eventId,eventName,awardName,year,occurrence,winAnnouncementTime,categoryName,nomeneeNote,name,originalName,songNames,episodeNames,characterNames,isWinner,isPrimary,isSecondary,isPerson,isTitle,isCompany,const,notes
+ev0000001,Festival,Golden Award,2001,1,,Best Film,,Alpha,,,,,True,True,False,False,True,False,tt0000001,
+ev0000002,Critics,Critics Award,2002,1,,Best Film,,Alpha,,,,,False,True,False,False,True,False,tt0000001,
+ev0000001,Festival,Golden Award,2001,1,,Best Director,,Director One,,,,,True,False,True,True,False,False,nm0000001,
+ev0000002,Critics,Critics Award,2011,1,,Best Actor,,Actor Three,,,,,False,False,True,True,False,False,nm0000003,
+ev0000001,Festival,Golden Award,2011,1,,Best Film,,Delta,,,,,True,True,False,False,True,False,tt0000004,
+"""
+
+COUNTRY_ROWS = {
+    "Afghanistan": "AF",
+    "Albania": "AL",
+    "Argentina": "AR",
+}
+
+
+def write_countries(path):
+    header = (
+        "country\tabbreviation\tregion\tpopulation\tArea (sq. mi.)\tPop. Density (per sq. mi.)"
+        "\tCoastline (coast/area ratio)\tNet migration\tInfant mortality (per 1000 births)"
+        "\tgdpCapita\tLiteracy (%)\tPhones (per 1000)\tArable (%)\tCrops (%)\tOther (%)"
+        "\tClimate\tBirthrate\tDeathrate\tAgriculture\tIndustry\tService\n"
+    )
+    rows = [
+        f"{name} \t{code}\tREGION\t{(i + 1) * 1000000}\t1000\t1,5\t0\t0\t10\t{(i + 1) * 500}"
+        "\t50\t10\t10\t1\t89\t1\t20\t10\t0,2\t0,3\t0,5\n"
+        for i, (name, code) in enumerate(COUNTRY_ROWS.items())
+    ]
+    path.write_text(header + "".join(rows))
+
+
+@pytest.fixture
+def film_db(tmp_path, monkeypatch):
+    """Small but complete dataset loaded into ./processed_data/film.db."""
+    monkeypatch.chdir(tmp_path)
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "title.basics.tsv").write_text(BASICS)
+    (data / "title.akas.tsv").write_text(AKAS)
+    (data / "title.ratings.tsv").write_text(RATINGS)
+    (data / "name.basics.tsv").write_text(NAME_BASICS)
+    (data / "title.principals.tsv").write_text(PRINCIPALS)
+    (data / "title.crew.tsv").write_text(CREW)
+    (data / "title.episode.tsv").write_text(EPISODES)
+    (data / "awards.csv").write_text(AWARDS)
+    write_countries(data / "countries.tsv")
+    load_files({name: find_data_file(str(data), name) for name in DATA_FILES})
+    conn = get_connection()
+    refresh_derived_tables(conn)
+    conn.close()
+    return tmp_path
@@ -0,0 +1,65 @@
+import pytest
+import pandas as pd
+from film_ranking.lib.analyze import (
+    get_actors_rank,
+    get_cinematic_rank,
+    get_directors_rank,
+    get_producers_rank,
+)
+
+
+@pytest.mark.parametrize(
+    "rank, id_column, sort_by",
+    [
+        (get_directors_rank, "directorId", None),
+        (get_directors_rank, "directorId", "awardsCount"),
+        (get_producers_rank, "producerId", "movieCount"),
+        (get_actors_rank, "actorId", None),
+        (get_actors_rank, "actorId", "avgRating"),
+    ],
+)
+def test_pages_cover_the_ranking(film_db, rank, id_column, sort_by):
+    everyone = rank(1900, 2024, sort_by)
+    ids = []
+    after = None
+    while True:
+        page = rank(1900, 2024, sort_by, limit=1, after=after)
+        ids.extend(page[id_column])
+        after = page.attrs["next_after"]
+        if after is None:
+            break
+    assert ids == list(everyone[id_column])
+
+
+def test_limit(film_db):
+    df = get_actors_rank(1900, 2024, "movieCount", limit=2)
+    assert list(df["actorId"]) == ["nm0000003", "nm0000005"]
+    assert list(df["movies"]) == ["Alpha,Beta,Delta", "Beta,Epsilon,Delta"]
+    assert df.attrs["next_after"] == (3, "nm0000005")
+
+
+@pytest.mark.parametrize(
+    "rank, kwargs",
+    [
+        (get_directors_rank, {}),
+        (get_producers_rank, dict(sort_by="movieCount", limit=1)),
+        (get_actors_rank, dict(limit=2)),
+        (
+            get_actors_rank,
+            dict(sort_by="countryCount", limit=2, after=(2, "nm0000003")),
+        ),
+    ],
+)
+def test_partitioned_ranking(film_db, monkeypatch, rank, kwargs):
+    monkeypatch.setenv("FILM_RANKING_CACHE", "0")
+    expected = rank(1900, 2024, **kwargs)
+    monkeypatch.setenv("FILM_RANKING_WORKERS", "3")
+    result = rank(1900, 2024, **kwargs)
+    # a partition holding no missing value returns integers where the whole has floats
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert result.attrs == expected.attrs
+
+
+def test_unknown_cinematic_sort(film_db):
+    with pytest.raises(ValueError, match="Cannot sort by 'votes'"):
+        get_cinematic_rank(1900, 2024, sort_by="votes")
@@ -0,0 +1,52 @@
+import sqlite3
+
+from film_ranking.lib import autocomplete
+from film_ranking.lib.autocomplete import complete_person, complete_title
+
+
+def test_complete(film_db):
+    assert complete_title("alp") == [("tt0000001", "Alpha", 1000)]
+    assert complete_title("") == []
+    # actors credited on Alpha (1000 votes), Beta (500) and Delta (2000)
+    assert complete_person("Act") == [
+        ("nm0000003", "Actor Three", 3500),
+        ("nm0000005", "Actor Five", 2550),
+        ("nm0000004", "Actress Four", 1100),
+    ]
+    assert [const for const, _, _ in complete_person("actor f", limit=1)] == [
+        "nm0000005"
+    ]
+
+
+def test_tops_match_ranges(monkeypatch):
+    monkeypatch.setattr(autocomplete, "HOT_RANGE", 2)
+    monkeypatch.setattr(autocomplete, "TOP_COMPLETIONS", 2)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE source (const TEXT, label TEXT, votes INTEGER)")
+    entries = [
+        ("a", "Star Wars", 50),
+        ("b", "Star Trek", 70),
+        ("c", "Stardust", 10),
+        ("d", "Stär Man", 30),
+        ("e", "Stand", 5),
+        ("f", "Up", 1),
+    ]
+    conn.executemany("INSERT INTO source VALUES (?, ?, ?)", entries)
+    autocomplete.build_completions(
+        conn.cursor(), "test", "SELECT const, label, votes FROM source"
+    )
+    tops = {
+        prefix for (prefix,) in conn.execute("SELECT prefix FROM test_completion_tops")
+    }
+    assert {"s", "st", "sta", "star"} <= tops
+    for prefix in ["s", "st", "sta", "star", "star ", "stan", "u", "x"]:
+        key = autocomplete.completion_key(prefix)
+        expected = sorted(
+            (
+                entry
+                for entry in entries
+                if autocomplete.completion_key(entry[1]).startswith(key)
+            ),
+            key=lambda entry: -entry[2],
+        )[:2]
+        assert autocomplete.complete("test", prefix, 2, conn) == expected
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from film_ranking.lib import analyze, batch
+
+
+def test_run_batch(film_db):
+    summary = batch.run_batch(year_start=1900, year_end=2024, threads=3)
+    assert [entry["job"] for entry in summary] == list(batch.JOBS)
+    for entry in summary:
+        assert entry["finished"] >= entry["started"]
+        assert len(pd.read_csv(entry["output"])) == entry["rows"] > 0
+    with open(os.path.join(batch.BATCH_FOLDER, "summary.json")) as f:
+        assert json.load(f) == summary
+
+
+def test_limits(film_db, monkeypatch, tmp_path):
+    summary = batch.run_batch(year_start=1900, year_end=2024, limit=1)
+    rows = {entry["job"]: entry["rows"] for entry in summary}
+    assert rows.pop("top_countries") > 1
+    assert set(rows.values()) == {1}
+
+    # the movies ranking keeps as many titles as `analyze top_movies`
+    limits = []
+    cinematic_rank = analyze.get_cinematic_rank
+
+    def spy(year_start, year_end, limit=None):
+        limits.append(limit)
+        return cinematic_rank(year_start, year_end, limit=limit)
+
+    monkeypatch.setattr(analyze, "get_cinematic_rank", spy)
+    batch.run_batch(["top_movies"], folder=str(tmp_path))
+    assert limits == [10]
+
+
+def test_failed_job(film_db, monkeypatch, tmp_path):
+    def fail(year_start, year_end, limit=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(analyze, "get_cinematic_rank", fail)
+    summary = batch.run_batch(["top_movies", "top_actors"], folder=str(tmp_path))
+    assert "boom" in summary[0]["error"]
+    assert summary[1]["rows"] > 0
+    with pytest.raises(ValueError):
+        batch.run_batch(["top_films"])
+
+
+def test_partitioned_batch(film_db, monkeypatch, tmp_path):
+    monkeypatch.setenv("FILM_RANKING_CACHE", "0")
+    jobs = ["top_directors", "top_producers", "top_actors"]
+    expected = batch.run_batch(jobs, 1900, 2024, folder=str(tmp_path / "serial"))
+    # the threads of the batch share the ranking pool
+    monkeypatch.setenv("FILM_RANKING_WORKERS", "2")
+    summary = batch.run_batch(jobs, 1900, 2024, folder=str(tmp_path / "partitioned"))
+    for entry, expected_entry in zip(summary, expected):
+        pd.testing.assert_frame_equal(
+            pd.read_csv(entry["output"]), pd.read_csv(expected_entry["output"])
+        )
+    assert analyze.ranking_pool(2) is analyze.ranking_pool(1)
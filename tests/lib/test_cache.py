@@ -0,0 +1,64 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from film_ranking.lib import analyze, cache
+from film_ranking.lib.analyze import get_actors_rank, get_cinematic_rank
+
+
+def no_query(query, params):
+    raise AssertionError("query ran despite a cached result")
+
+
+def cache_entries():
+    return len(os.listdir(cache.CACHE_FOLDER))
+
+
+def test_frame_round_trip(tmp_path):
+    df = pd.DataFrame(
+        {
+            "id": ["a", None, "ü"],
+            "count": np.array([1, 2, 3]),
+            "rating": [1.5, np.nan, 2.0],
+            "empty": [None, None, None],
+        }
+    )
+    df.attrs["next_after"] = (2.0, "ü")
+    path = str(tmp_path / "frame.npz")
+    cache.write_frame(path, df)
+    restored = cache.read_frame(path)
+    pd.testing.assert_frame_equal(restored, df)
+    assert restored.attrs == df.attrs
+
+
+def test_cache_hit(film_db, monkeypatch):
+    first = get_actors_rank(1900, 2024, "movieCount", limit=2)
+    assert cache_entries() == 1
+    monkeypatch.setattr(analyze, "read_query", no_query)
+    # same call, with the defaults spelled out
+    again = get_actors_rank(1900, 2024, sort_by="movieCount", limit=2, after=None)
+    pd.testing.assert_frame_equal(again, first)
+    assert again.attrs == first.attrs
+
+
+def test_invalidated_by_writes(film_db):
+    assert len(get_cinematic_rank(1900, 2024)) == 5
+    conn = sqlite3.connect("./processed_data/film.db")
+    conn.execute("DELETE FROM title_facts WHERE tconst = 'tt0000001'")
+    conn.commit()
+    conn.close()
+    assert len(get_cinematic_rank(1900, 2024)) == 4
+
+
+def test_eviction(film_db, monkeypatch):
+    monkeypatch.setattr(cache, "MAX_CACHE_ENTRIES", 2)
+    for limit in (1, 2, 3):
+        get_cinematic_rank(1900, 2024, limit=limit)
+    assert cache_entries() == 2
+
+
+def test_disabled(film_db, monkeypatch):
+    monkeypatch.setenv("FILM_RANKING_CACHE", "0")
+    get_cinematic_rank(1900, 2024)
+    assert not os.path.exists(cache.CACHE_FOLDER)
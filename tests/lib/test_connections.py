@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+from film_ranking.lib.connections import (
+    close_connections,
+    get_read_connection,
+    load_marker,
+    loading,
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "film.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ratings (tconst TEXT, numVotes INTEGER)")
+    conn.execute("INSERT INTO ratings VALUES ('tt0000001', 10)")
+    conn.commit()
+    conn.close()
+    yield path
+    close_connections()
+
+
+def test_reused_per_thread(db_path):
+    conn = get_read_connection(db_path)
+    assert get_read_connection(db_path) is conn
+    assert conn.execute("PRAGMA temp_store").fetchone() == (2,)
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_read_connection(db_path)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_read_only(db_path):
+    with pytest.raises(sqlite3.OperationalError):
+        get_read_connection(db_path).execute("DELETE FROM ratings")
+
+
+def test_reopened_after_reload(db_path):
+    conn = get_read_connection(db_path)
+    with loading(db_path):
+        assert os.path.exists(load_marker(db_path))
+        writer = sqlite3.connect(db_path)
+        writer.execute("INSERT INTO ratings VALUES ('tt0000002', 20)")
+        writer.commit()
+        writer.close()
+    assert not os.path.exists(load_marker(db_path))
+    reopened = get_read_connection(db_path)
+    assert reopened is not conn
+    assert reopened.execute("SELECT COUNT(*) FROM ratings").fetchone() == (2,)
+
+
+def test_reopened_when_a_load_starts(db_path):
+    conn = get_read_connection(db_path)
+    # another process starts loading, the file is not written yet
+    open(load_marker(db_path), "w").close()
+    reopened = get_read_connection(db_path)
+    assert reopened is not conn
+    assert get_read_connection(db_path) is reopened
+    os.remove(load_marker(db_path))
+
+
+def test_close_connections(db_path):
+    conn = get_read_connection(db_path)
+    close_connections()
+    assert get_read_connection(db_path) is not conn
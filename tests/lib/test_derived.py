@@ -0,0 +1,93 @@
+import sqlite3
+
+from film_ranking.lib.analyze import (
+    get_actors_rank,
+    get_cinematic_rank,
+    get_movies_with_regional_data,
+)
+from film_ranking.lib.derived import refresh_derived_tables
+from film_ranking.lib.load_data import get_connection
+
+
+def query(sql):
+    conn = sqlite3.connect("./processed_data/film.db")
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+
+def test_title_origin(film_db):
+    assert query("SELECT tconst, region FROM title_origin ORDER BY tconst") == [
+        ("tt0000001", "AF"),
+        ("tt0000002", "AL"),
+        ("tt0000003", "AR"),
+        ("tt0000004", "AF"),
+        ("tt0000005", "AL"),
+    ]
+    df = get_movies_with_regional_data(1900, 2024)
+    assert dict(zip(df["region"], df["numFilms"])) == {"AF": 2, "AL": 2, "AR": 1}
+
+
+def test_refresh_only_dependent_tables(film_db):
+    conn = get_connection()
+    conn.execute("DELETE FROM title_origin")
+    conn.commit()
+    refresh_derived_tables(conn, {"ratings"})
+    assert query("SELECT COUNT(*) FROM title_origin") == [(0,)]
+    refresh_derived_tables(conn, {"akas"})
+    assert query("SELECT COUNT(*) FROM title_origin") == [(5,)]
+    conn.close()
+
+
+def test_award_stats(film_db):
+    assert query(
+        "SELECT const, awardsCount, wins, firstYear, lastYear FROM award_stats"
+        " ORDER BY const"
+    ) == [
+        ("nm0000001", 1, 1, 2001, 2001),
+        ("nm0000003", 1, 0, 2011, 2011),
+        ("tt0000001", 2, 1, 2001, 2002),
+        ("tt0000004", 1, 1, 2011, 2011),
+    ]
+
+
+def test_title_facts(film_db):
+    assert query(
+        "SELECT tconst, region, product, awardsCount, wins FROM title_facts"
+        " ORDER BY product DESC"
+    ) == [
+        ("tt0000004", "AF", 18000.0, 1, 1),
+        ("tt0000001", "AF", 8000.0, 2, 1),
+        ("tt0000002", "AL", 3000.0, 0, 0),
+        ("tt0000003", "AR", 700.0, 0, 0),
+        ("tt0000005", "AL", 250.0, 0, 0),
+    ]
+    df = get_cinematic_rank(2000, 2005, genre="Drama", mtype="movie", country="AF")
+    assert list(df["titleId"]) == ["tt0000001"]
+    assert list(df["awards_count"]) == [2]
+
+
+def test_year_buckets(film_db):
+    assert query(
+        "SELECT startYear, movieCount, totalVotes, moviesWithAwards, movies"
+        " FROM person_year_stats WHERE role = 'director' ORDER BY startYear"
+    ) == [
+        (2000, 1, 1000, 1, "Alpha"),
+        (2001, 1, 500, 0, "Beta"),
+        (2002, 1, 100, 0, "Gamma"),
+    ]
+    assert query(
+        "SELECT region, SUM(numFilms) FROM country_year_stats"
+        " WHERE startYear BETWEEN 2001 AND 2010 GROUP BY region ORDER BY region"
+    ) == [("AF", 1), ("AL", 2), ("AR", 1)]
+
+
+def test_actors_rank_sums_buckets(film_db):
+    df = get_actors_rank(2000, 2002, sort_by="movieCount")
+    # actresses are ranked along with actors
+    assert dict(zip(df["actorId"], df["movieCount"])) == {
+        "nm0000003": 2,
+        "nm0000005": 2,
+        "nm0000004": 2,
+    }
+    assert dict(zip(df["actorId"], df["countryCount"]))["nm0000005"] == 1
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from film_ranking.lib import analyze
+
+CALLS = [
+    (analyze.get_cinematic_rank, (1900, 2024), {}),
+    (analyze.get_cinematic_rank, (2000, 2010), dict(limit=2, sort_by="awards_count")),
+    (analyze.get_cinematic_rank, (1900, 2024), dict(genre="Drama", country="AF")),
+    (analyze.get_movies_with_regional_data, (1900, 2024), {}),
+    (analyze.get_movies_with_regional_data, (2000, 2001), dict(sort_by="gdp_rank")),
+    (analyze.get_directors_rank, (1900, 2024), {}),
+    (analyze.get_directors_rank, (2000, 2002), dict(sort_by="awardPercentage")),
+    (analyze.get_directors_rank, (1900, 2024), dict(sort_by="movieCount", limit=1)),
+    (analyze.get_producers_rank, (1900, 2024), {}),
+    (analyze.get_producers_rank, (1900, 2024), dict(limit=1, after=(500000.0, "nm0"))),
+    (analyze.get_actors_rank, (1900, 2024), {}),
+    (analyze.get_actors_rank, (2001, 2010), dict(sort_by="countryCount", limit=2)),
+]
+
+
+def run(engine, monkeypatch, func, args, kwargs):
+    monkeypatch.setenv("FILM_RANKING_ENGINE", engine)
+    df = func(*args, **kwargs)
+    if "regions" in df:
+        # GROUP_CONCAT DISTINCT lists regions in no particular order
+        df["regions"] = df["regions"].map(lambda regions: sorted(regions.split(",")))
+    return df
+
+
+@pytest.mark.parametrize("func, args, kwargs", CALLS)
+def test_engines_agree(film_db, monkeypatch, func, args, kwargs):
+    monkeypatch.setenv("FILM_RANKING_CACHE", "0")
+    expected = run("sqlite", monkeypatch, func, args, kwargs)
+    result = run("numpy", monkeypatch, func, args, kwargs)
+    assert len(expected)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert result.attrs == expected.attrs
+
+
+def test_unknown_engine(film_db, monkeypatch):
+    monkeypatch.setenv("FILM_RANKING_ENGINE", "spark")
+    with pytest.raises(ValueError):
+        analyze.get_actors_rank(1900, 2024)
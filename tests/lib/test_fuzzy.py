@@ -0,0 +1,47 @@
+import sqlite3
+
+from film_ranking.lib import fuzzy
+from film_ranking.lib.analyze import search_movie, search_person
+from film_ranking.lib.connections import get_read_connection
+
+
+def test_trigrams():
+    assert fuzzy.trigrams("Ab") == {"  a", " ab", "ab "}
+    assert fuzzy.trigrams("Dé") == fuzzy.trigrams("de")
+    assert fuzzy.trigrams(None) == set()
+
+
+def test_build_chunks(monkeypatch):
+    monkeypatch.setattr(fuzzy, "CHUNK_SIZE", 2)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE source (const TEXT, text TEXT)")
+    conn.executemany(
+        "INSERT INTO source VALUES (?, ?)",
+        [("a", "Anna"), ("b", "Hanna"), ("c", "Annie"), ("d", "Bob")],
+    )
+    fuzzy.build_trigram_index(conn.cursor(), "test", "SELECT const, text FROM source")
+    postings = fuzzy.read_postings(conn, "test", ["ann", "zzz"])
+    assert postings[0].tolist() == [0, 1, 2]
+    assert len(postings[1]) == 0
+    chunks = conn.execute("SELECT COUNT(*) FROM test_trigrams WHERE trigram = 'ann'")
+    assert chunks.fetchone() == (2,)
+    assert [const for const, _, _ in fuzzy.lookup(conn, "test", "anna", 2)] == [
+        "a",
+        "b",
+    ]
+    assert fuzzy.lookup(conn, "test", "xyz") == []
+
+
+def test_lookup(film_db):
+    conn = get_read_connection()
+    const, name, similarity = fuzzy.lookup(conn, "name_fuzzy", "Directr Onee")[0]
+    assert (const, name) == ("nm0000001", "Director One")
+    assert 0 < similarity < 1
+    assert fuzzy.lookup(conn, "name_fuzzy", "Director One")[0][2] == 1
+    assert fuzzy.lookup(conn, "title_fuzzy", "Epsilom")[0][0] == "tt0000005"
+
+
+def test_search_falls_back_to_similar(film_db):
+    assert search_person("Actres Fuor")["nconst"].iloc[0] == "nm0000004"
+    assert list(search_movie("Alpah")["tconst"])[:1] == ["tt0000001"]
+    assert search_person("qqqq").empty
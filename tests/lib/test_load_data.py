@@ -0,0 +1,140 @@
+import bz2
+import gzip
+import lzma
+import sqlite3
+
+import pytest
+from film_ranking.lib.load_data import (
+    INDEXES,
+    find_data_file,
+    load_movie_ratings,
+    load_movies_akas,
+    load_movies_basics,
+    lazy_pandas_chunk_reader,
+)
+
+
+@pytest.fixture
+def ratings_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    content = "tconst\taverageRating\tnumVotes\n" + "".join(
+        f"tt{i:07d}\t{i % 10}.5\t{i * 10}\n" for i in range(1, 26)
+    )
+    ratings_file = tmp_path / "title.ratings.tsv"
+    ratings_file.write_text(content)
+    return str(ratings_file)
+
+
+def fetch_ratings():
+    conn = sqlite3.connect("./processed_data/film.db")
+    rows = conn.execute("SELECT * FROM ratings ORDER BY tconst").fetchall()
+    conn.close()
+    return rows
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 25, 1000])
+def test_batched_load(ratings_file, batch_size):
+    assert load_movie_ratings(ratings_file, batch_size=batch_size) == 25
+    rows = fetch_ratings()
+    assert len(rows) == 25
+    assert rows[0] == ("tt0000001", 1.5, 10)
+    assert rows[-1] == ("tt0000025", 5.5, 250)
+
+
+def index_names():
+    conn = sqlite3.connect("./processed_data/film.db")
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ratings'"
+        " AND name NOT LIKE 'sqlite_autoindex%' ORDER BY name"
+    ).fetchall()
+    conn.close()
+    return [name for (name,) in rows]
+
+
+@pytest.mark.parametrize("defer_indexes", [False, True])
+def test_reload_keeps_indexes(ratings_file, defer_indexes):
+    load_movie_ratings(ratings_file, batch_size=4, defer_indexes=defer_indexes)
+    load_movie_ratings(ratings_file, batch_size=4, defer_indexes=defer_indexes)
+    assert len(fetch_ratings()) == 25
+    assert index_names() == sorted(INDEXES["ratings"])
+
+
+def test_parallel_load(ratings_file):
+    assert load_movie_ratings(ratings_file, batch_size=4, workers=3) == 25
+    assert len(fetch_ratings()) == 25
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".xz", ".bz2"])
+def test_compressed_load(ratings_file, tmp_path, suffix):
+    compressed = tmp_path / "compressed"
+    compressed.mkdir()
+    content = open(ratings_file, "rb").read()
+    opener = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}[suffix]
+    with opener(compressed / f"title.ratings.tsv{suffix}", "wb") as f:
+        f.write(content)
+
+    file_path = find_data_file(str(compressed), "title.ratings.tsv")
+    assert file_path.endswith(suffix)
+    assert load_movie_ratings(file_path, batch_size=4, workers=2) == 25
+    assert fetch_ratings()[-1] == ("tt0000025", 5.5, 250)
+
+
+def test_typed_imdb_columns(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "title.basics.tsv").write_text(
+        "tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\truntimeMinutes\tgenres\n"
+        'tt0000001\tmovie\t"Quoted" Title\t"Quoted" Title\t0\t1994\t\\N\t142\tDrama\n'
+        "tt0000002\tshort\tUntitled\tUntitled\t1\t\\N\t\\N\t\\N\t\\N\n"
+    )
+    assert load_movies_basics(str(tmp_path / "title.basics.tsv")) == 2
+    conn = sqlite3.connect("./processed_data/film.db")
+    rows = conn.execute(
+        "SELECT primaryTitle, isAdult, startYear, typeof(startYear), endYear, genres"
+        " FROM basics ORDER BY tconst"
+    ).fetchall()
+    conn.close()
+    assert rows == [
+        ('"Quoted" Title', 0, 1994, "integer", None, "Drama"),
+        ("Untitled", 1, None, "null", None, None),
+    ]
+
+
+def test_reload_akas_without_region(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "title.akas.tsv").write_text(
+        "titleId\tordering\ttitle\tregion\tlanguage\ttypes\tattributes\tisOriginalTitle\n"
+        "tt0000001\t1\tAlpha\t\\N\t\\N\toriginal\t\\N\t1\n"
+        "tt0000001\t2\tAlpha\tAR\t\\N\t\\N\t\\N\t0\n"
+        "tt0000001\t3\tAlpha\tAF\t\\N\t\\N\t\\N\t0\n"
+    )
+    load_movies_akas(str(tmp_path / "title.akas.tsv"))
+    load_movies_akas(str(tmp_path / "title.akas.tsv"))
+    conn = sqlite3.connect("./processed_data/film.db")
+    rows = conn.execute(
+        "SELECT region FROM akas WHERE titleId = 'tt0000001' ORDER BY region"
+    ).fetchall()
+    conn.close()
+    assert rows == [("",), ("AF",), ("AR",)]
+
+
+def test_digests_ignore_chunk_boundaries(tmp_path):
+    # without a type map, each chunk infers its own dtypes
+    (tmp_path / "title.crew.tsv").write_text(
+        "tconst\tdirectors\tepisodes\n"
+        "tt0000001\t\\N\t1\n"
+        "tt0000002\t\\N\t\\N\n"
+        "tt0000003\tnm0000001\t3\n"
+        "tt0000004\tnm0000002\t4\n"
+    )
+
+    def digests(chunksize):
+        chunks = lazy_pandas_chunk_reader(
+            str(tmp_path / "title.crew.tsv"),
+            chunksize,
+            digests=True,
+            na_values=["\\N"],
+            keep_default_na=False,
+        )
+        return [digest for _, chunk_digests in chunks for digest in chunk_digests]
+
+    assert digests(1) == digests(2) == digests(3)
@@ -0,0 +1,39 @@
+import pytest
+from film_ranking.lib.load_data import lazy_pandas_chunk_reader
+from film_ranking.lib.parallel_load import parallel_chunk_reader, split_byte_ranges
+
+
+@pytest.fixture
+def tsv_file(tmp_path):
+    content = "tconst\tordering\tnconst\n" + "".join(
+        f"tt{i:07d}\t{i % 5}\tnm{i:07d}\n" for i in range(1, 101)
+    )
+    tsv_file = tmp_path / "title.principals.tsv"
+    tsv_file.write_text(content)
+    return str(tsv_file)
+
+
+@pytest.mark.parametrize("parts", [1, 3, 7, 500])
+def test_ranges_are_line_aligned(tsv_file, parts):
+    header, ranges = split_byte_ranges(tsv_file, parts)
+    data = open(tsv_file, "rb").read()
+    assert header == b"tconst\tordering\tnconst\n"
+    assert ranges[0][0] == len(header)
+    assert ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[start - 1 : start] == b"\n"
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_parallel_reader_matches_serial(tsv_file, workers):
+    serial = [row for rows in lazy_pandas_chunk_reader(tsv_file, 7) for row in rows]
+    parallel = [
+        row
+        for rows in parallel_chunk_reader(
+            tsv_file, lazy_pandas_chunk_reader, workers, chunksize=7
+        )
+        for row in rows
+    ]
+    assert len(parallel) == 100
+    assert sorted(parallel) == sorted(serial)
@@ -0,0 +1,29 @@
+import pytest
+from film_ranking.lib.analyze import (
+    get_directors_rank,
+    get_movies_with_regional_data,
+    search_movie,
+)
+from film_ranking.lib.query import compose, sort_column
+
+
+def test_compose():
+    assert compose({}, "SELECT 1") == "SELECT 1"
+    assert compose(dict(a="SELECT 1", b="SELECT * FROM a"), "SELECT * FROM b") == (
+        "WITH a AS (SELECT 1),\nb AS (SELECT * FROM a)\nSELECT * FROM b"
+    )
+
+
+def test_sort_column_whitelist():
+    assert sort_column("gdp", ("gdp", "votes")) == '"gdp"'
+    with pytest.raises(ValueError):
+        sort_column('gdp" --', ("gdp", "votes"))
+
+
+def test_values_are_bound(film_db):
+    assert list(search_movie("Alpha")["tconst"]) == ["tt0000001"]
+    # not every title, only the one closest to the words of the keyword
+    assert list(search_movie('Alpha" OR "1" = "1')["tconst"]) == ["tt0000001"]
+    with pytest.raises(ValueError):
+        get_directors_rank(1900, 2024, sort_by="movieCount; DROP TABLE basics")
+    assert len(get_movies_with_regional_data(1900, 2024, "numFilms")) == 3
@@ -0,0 +1,145 @@
+import sqlite3
+
+import pytest
+from film_ranking.lib.scheduler import load_files
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ratings = "tconst\taverageRating\tnumVotes\n" + "".join(
+        f"tt{i:07d}\t{i % 10}.5\t{i * 10}\n" for i in range(1, 21)
+    )
+    crew = "tconst\tdirectors\twriters\n" + "".join(
+        f"tt{i:07d}\tnm{i:07d}\tnm{i + 1:07d}\n" for i in range(1, 11)
+    )
+    (tmp_path / "title.ratings.tsv").write_text(ratings)
+    (tmp_path / "title.crew.tsv").write_text(crew)
+    return {
+        "title.ratings.tsv": str(tmp_path / "title.ratings.tsv"),
+        "title.crew.tsv": str(tmp_path / "title.crew.tsv"),
+    }
+
+
+def count_rows(table):
+    conn = sqlite3.connect("./processed_data/film.db")
+    (count,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+    conn.close()
+    return count
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_load_files(files, jobs):
+    timeline = load_files(files, jobs=jobs, batch_size=3)
+    assert {entry["table"]: entry["rows"] for entry in timeline} == {
+        "ratings": 20,
+        "crew": 10,
+    }
+    # loading again merges into the populated tables
+    load_files(files, jobs=jobs, batch_size=3, defer_indexes=True)
+    assert count_rows("ratings") == 20
+    assert count_rows("crew") == 10
+
+
+def test_dependencies_are_merged_first(files):
+    timeline = load_files(
+        files, jobs=2, dependencies={"title.ratings.tsv": {"title.crew.tsv"}}
+    )
+    assert [entry["table"] for entry in timeline] == ["crew", "ratings"]
+    assert timeline[1]["started"] >= timeline[0]["merged"]
+
+
+def test_incremental_reload(files):
+    timeline = load_files(files, incremental=True, batch_size=3)
+    assert {entry["table"] for entry in timeline} == {"ratings", "crew"}
+
+    # only the ratings change: one updated, one removed and one new row
+    with open(files["title.ratings.tsv"]) as f:
+        lines = f.read().splitlines()
+    lines[1] = "tt0000001\t9.9\t12345"
+    del lines[2]
+    lines.append("tt0000099\t7.0\t70")
+    with open(files["title.ratings.tsv"], "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+    timeline = load_files(files, incremental=True, batch_size=3)
+    assert [entry["table"] for entry in timeline] == ["ratings"]
+
+    conn = sqlite3.connect("./processed_data/film.db")
+    ratings = dict(
+        (tconst, (rating, votes))
+        for tconst, rating, votes in conn.execute("SELECT * FROM ratings")
+    )
+    conn.close()
+    assert len(ratings) == 20
+    assert ratings["tt0000001"] == (9.9, 12345)
+    assert "tt0000002" not in ratings
+    assert ratings["tt0000099"] == (7.0, 70)
+    assert count_rows("ratings_digests") == 20
+
+
+def test_incremental_akas_without_region(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    akas = tmp_path / "title.akas.tsv"
+    header = (
+        "titleId\tordering\ttitle\tregion\tlanguage\ttypes\tattributes\tisOriginalTitle"
+    )
+    lines = [header]
+    for i in range(1, 6):
+        lines.append(f"tt{i:07d}\t1\tTitle {i}\t\\N\t\\N\toriginal\t\\N\t1")
+        lines.append(f"tt{i:07d}\t2\tTitle {i}\tAR\t\\N\t\\N\t\\N\t0")
+    akas.write_text("\n".join(lines) + "\n")
+    files = {"title.akas.tsv": str(akas)}
+    load_files(files, incremental=True, batch_size=3)
+    assert count_rows("akas") == 10
+
+    # an aka without a region is renamed, another one removed
+    lines[1] = lines[1].replace("Title 1", "Renamed")
+    del lines[3]
+    akas.write_text("\n".join(lines) + "\n")
+    load_files(files, incremental=True, batch_size=3)
+
+    conn = sqlite3.connect("./processed_data/film.db")
+    rows = conn.execute(
+        "SELECT titleId, title, region FROM akas WHERE titleId <= 'tt0000002'"
+        " ORDER BY titleId, region"
+    ).fetchall()
+    conn.close()
+    assert rows == [
+        ("tt0000001", "Renamed", ""),
+        ("tt0000001", "Title 1", "AR"),
+        ("tt0000002", "Title 2", "AR"),
+    ]
+    assert count_rows("akas") == 9
+    assert count_rows("akas_digests") == 9
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_incremental_after_full_load(files, jobs):
+    ratings = {"title.ratings.tsv": files["title.ratings.tsv"]}
+    load_files(ratings, incremental=True, batch_size=3)
+    with open(files["title.ratings.tsv"]) as f:
+        original = f.read()
+    lines = original.splitlines()
+    lines[1] = "tt0000001\t9.9\t12345"
+    with open(files["title.ratings.tsv"], "w") as f:
+        f.write("\n".join(lines) + "\n")
+    load_files(ratings, jobs=jobs, batch_size=3)
+
+    # the incremental load reverts tt0000001 and removes tt0000002
+    lines = original.splitlines()
+    del lines[2]
+    with open(files["title.ratings.tsv"], "w") as f:
+        f.write("\n".join(lines) + "\n")
+    load_files(ratings, incremental=True, batch_size=3)
+
+    conn = sqlite3.connect("./processed_data/film.db")
+    ratings = dict(
+        (tconst, (rating, votes))
+        for tconst, rating, votes in conn.execute("SELECT * FROM ratings")
+    )
+    conn.close()
+    assert len(ratings) == 19
+    assert ratings["tt0000001"] == (1.5, 10)
+    assert "tt0000002" not in ratings
+    assert count_rows("ratings_digests") == 19
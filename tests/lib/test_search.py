@@ -0,0 +1,23 @@
+from film_ranking.lib.analyze import search_movie, search_person
+from film_ranking.lib.query import match_query
+
+
+def test_match_query():
+    assert match_query("captain amer") == '"captain" "amer"*'
+    assert match_query('Alpha" OR "1') == '"Alpha" "OR" "1"*'
+    assert match_query("") == '""'
+
+
+def test_search_movie(film_db):
+    assert list(search_movie("alp")["tconst"]) == ["tt0000001"]
+    # aka titles, diacritics folded both ways
+    assert list(search_movie("delta forc")["tconst"]) == ["tt0000004"]
+    assert list(search_movie("Délta")["tconst"]) == ["tt0000004"]
+    assert list(search_movie("gamma x")["tconst"]) == ["tt0000003"]
+    assert search_movie(None).empty
+
+
+def test_search_person(film_db):
+    df = search_person("act", limit=10)
+    assert set(df["nconst"]) == {"nm0000003", "nm0000004", "nm0000005"}
+    assert list(search_person("director one")["primaryName"]) == ["Director One"]